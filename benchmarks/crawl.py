@@ -0,0 +1,127 @@
+''' End-to-end crawl benchmark: the full Crawler/Worker/Frontier/scraper
+    stack against a local cache server replaying a corpus, once per thread
+    count. Each run is a fresh process in a scratch directory, so peak RSS
+    and CPU time are its own. Throughput counts pages that returned 200 and
+    were parsed; requests counts everything the server answered, 404s for
+    links outside a recorded corpus included.
+
+    python -m benchmarks.crawl --threads 1 4 8
+    python -m benchmarks.crawl --corpus recorded.corpus --threads 1 8
+
+Without --corpus a synthetic corpus of --pages pages is generated. Record a
+real one by setting RECORDFILE in config.ini for a normal crawl.
+'''
+import os
+import sys
+import time
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from utils.cache_server import StandInCacheServer, load_corpus, synthetic_corpus
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.ini")
+
+
+def make_config(config_file, cache_server, threads, parse_mode):
+    from utils.config import Config
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    local = cparser["LOCAL PROPERTIES"]
+    local["THREADCOUNT"] = str(threads)
+    local["SAVE"] = "frontier.shelve"
+    local["RECORDFILE"] = ""
+    local["RESPONSECACHE"] = ""
+    # No robots.txt requests, and no trap cut-offs, which depend on the
+    # order pages come in and would change the work with the thread count.
+    local["ROBOTSTTL"] = "0"
+    local["TRAPMINYIELD"] = "0"
+    local["METRICSFILE"] = ""
+    local["METRICSPORT"] = "0"
+    if parse_mode:
+        local["PARSEMODE"] = parse_mode
+    # The replay server is local; politeness would only measure sleeping.
+    cparser["CRAWLER"]["POLITENESS"] = "0"
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        config = Config(cparser)
+    config.cache_server = cache_server
+    return config
+
+
+def crawl(config_file, cache_server, threads, parse_mode, results):
+    # Runs in a child process, inside a scratch directory.
+    os.chdir(tempfile.mkdtemp(prefix="crawl-benchmark-"))
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        from crawler import Crawler
+        import scraper
+        config = make_config(config_file, cache_server, threads, parse_mode)
+        start = time.perf_counter()
+        Crawler(config, restart=True).start()
+        elapsed = time.perf_counter() - start
+        # Every page merged into the analytics: 200, parsed, new url.
+        parsed = len(scraper.seen_urls)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    results.put({
+        "elapsed": elapsed,
+        "pages": parsed,
+        "cpu": (usage.ru_utime + usage.ru_stime
+                + children.ru_utime + children.ru_stime),
+        # ru_maxrss is in KiB on Linux and bytes on macOS.
+        "peak_rss": usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+    })
+
+
+def run(server, config_file, threads, parse_mode):
+    served = server.requests_served
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=crawl,
+        args=(config_file, server.address, threads, parse_mode, results))
+    process.start()
+    result = results.get()
+    process.join()
+    result["requests"] = server.requests_served - served
+    return result
+
+
+def main(config_file, corpus_file, page_count, latency, thread_counts, parse_mode):
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    if corpus_file:
+        corpus = load_corpus(corpus_file)
+    else:
+        seed_urls = cparser["CRAWLER"]["SEEDURL"].split(",")
+        corpus = synthetic_corpus(seed_urls, page_count)
+    print(f"corpus: {len(corpus)} pages")
+    server = StandInCacheServer(corpus=corpus, latency=latency).start()
+    try:
+        for threads in thread_counts:
+            result = run(server, config_file, threads, parse_mode)
+            pages = result["pages"] or 1
+            print(f"threads={threads:<4} {pages / result['elapsed']:8.1f} pages/sec "
+                  f"{1000 * result['cpu'] / pages:7.2f} ms CPU/page "
+                  f"{result['peak_rss'] / 2 ** 20:7.1f} MiB peak RSS "
+                  f"({result['pages']} pages, {result['requests']} requests "
+                  f"in {result['elapsed']:.2f}s)")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--config_file", type=str, default=CONFIG_FILE)
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--parse_mode", choices=["thread", "process"], default=None)
+    args = parser.parse_args()
+    main(os.path.abspath(args.config_file), args.corpus, args.pages,
+         args.latency, args.threads, args.parse_mode)
@@ -0,0 +1,49 @@
+''' Offline download throughput against the local stand-in cache server.
+
+    python -m benchmarks.download --urls 500 --latency 0.01 --concurrency 1 8 32
+'''
+import time
+
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+from utils import get_logger
+from utils.cache_server import StandInCacheServer
+from utils.download import download, download_many
+
+
+def run(server, urls, concurrency, logger):
+    config = SimpleNamespace(
+        cache_server=server.address, user_agent="IR benchmark",
+        download_concurrency=concurrency, record_file="",
+        response_cache="")
+    start = time.perf_counter()
+    if concurrency == 1:
+        responses = [download(url, config, logger) for url in urls]
+    else:
+        responses = download_many(urls, config, logger)
+    elapsed = time.perf_counter() - start
+    assert all(resp.status == 200 for resp in responses)
+    return elapsed
+
+
+def main(url_count, latency, concurrencies):
+    logger = get_logger("BENCHMARK")
+    server = StandInCacheServer(latency=latency).start()
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(url_count)]
+    try:
+        for concurrency in concurrencies:
+            elapsed = run(server, urls, concurrency, logger)
+            print(f"concurrency={concurrency:<4} {url_count / elapsed:8.1f} pages/sec "
+                  f"({elapsed:.2f}s for {url_count} urls)")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+    main(args.urls, args.latency, args.concurrency)
@@ -0,0 +1,66 @@
+''' Cold-start benchmark: how long a fresh interpreter takes to import the
+    crawler's modules, and which imports cost the most. Every run is a new
+    process, so nothing is cached in sys.modules; the OS file cache is warm
+    after the first run, which the median hides.
+
+    python -m benchmarks.startup --repeat 10
+'''
+import os
+import sys
+import time
+import subprocess
+
+from argparse import ArgumentParser
+from statistics import median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    ("scraper", "import scraper"),
+    ("crawler", "import crawler"),
+    ("workers", "import crawler.worker as w; w.check_scraper_source()"),
+]
+
+
+def run(statement):
+    # (wall seconds, {module: cumulative import microseconds}) for the
+    # modules the statement's imports import directly.
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode:
+        raise SystemExit(f"{statement!r} failed:\n{process.stderr}")
+    imports = dict()
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # imported directly by a top-level import
+            imports[name.strip()] = int(cumulative)
+    return elapsed, imports
+
+
+def main(repeat, top):
+    baseline = median(run("pass")[0] for _ in range(repeat))
+    print(f"interpreter  {baseline * 1000:7.1f} ms")
+    for name, statement in TARGETS:
+        runs = [run(statement) for _ in range(repeat)]
+        elapsed = median(wall for wall, _ in runs)
+        print(f"{name:<12} {elapsed * 1000:7.1f} ms "
+              f"({(elapsed - baseline) * 1000:.1f} ms over the interpreter)")
+        imports = runs[-1][1]
+        for module, micros in sorted(
+                imports.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {micros / 1000:7.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+    main(args.repeat, args.top)
@@ -0,0 +1,126 @@
+''' Micro-benchmark of utils.url_filter against the per-call version it
+    replaced, over a corpus of real ICS urls. Fails if any accept/reject
+    decision or normalized url differs.
+
+    python -m benchmarks.url_filter --repeat 200
+'''
+import os
+import re
+import time
+
+from argparse import ArgumentParser
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+
+from utils.url_filter import UrlFilter
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "ics_urls.txt")
+
+
+def legacy_normalize_url(parsed_url):
+    excluded_params = [
+        'sessionId', 'PHPSESSID', 'JSESSIONID', 'utm_source', 'utm_medium',
+        'utm_campaign', 'utm_term', 'utm_content', 'gclid', 'fbclid', 'ref',
+        'tracking_id', 'referrer', 'source', 'entry', 'index', 'view', 'sort',
+        'filter', 'format', 't', 'token', 'lang', 'locale', 'calendar',
+        'eventDate', 'eventDisplay', 'post_type', 'outlook-ical', 'ical',
+        'comment'
+    ]
+    query_params = parse_qs(parsed_url.query)
+    for param in excluded_params:
+        query_params.pop(param, None)
+    normalized_query = urlencode(query_params, doseq=True)
+    return urlunparse(parsed_url._replace(query=normalized_query))
+
+
+def legacy_is_calendar_page(url):
+    parsed = urlparse(url)
+    calendar_patterns = [
+        r"(?:/day/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",
+        r"(?:/month/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))",
+        r"(?:/events/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",
+        r"(?:=(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",
+        r"(?:/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))",
+        r"(?<=\?|&)ical=[^&]*",
+        r"(?<=\?|&)outlook-ical=[^&]*"
+    ]
+    combined_pattern = '|'.join(calendar_patterns)
+    return bool(re.search(combined_pattern, parsed.path)
+                or re.search(combined_pattern, parsed.query))
+
+
+def legacy_is_valid(url):
+    # scraper.is_valid before the filter was precompiled, without the
+    # seen-url check and the prints.
+    valid_domains = [
+        ".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu",
+        ".stat.uci.edu", "today.uci.edu/department/information_computer_sciences"
+    ]
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    domain_allowed = any(parsed.netloc.endswith(domain) for domain in valid_domains)
+    path_allowed = "today.uci.edu/department/information_computer_sciences" in parsed.netloc + parsed.path
+    if not (domain_allowed or path_allowed):
+        return False
+    path = parsed.path.lower()
+    query = parsed.query.lower()
+    if (re.search(r"/(?:uploads|files)(?:/|$)", path)
+            or "login" in path
+            or "action=download" in query
+            or "action=login" in query
+            or "share=" in query):
+        return False
+    if legacy_is_calendar_page(url):
+        return False
+    if re.match(
+        r".*(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", path):
+        return False
+    return True
+
+
+def legacy(url):
+    return legacy_is_valid(url), legacy_normalize_url(urlparse(url))
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as corpus:
+        return [line.strip() for line in corpus
+                if line.strip() and not line.startswith("#")]
+
+
+def main(repeat):
+    urls = load_corpus()
+    url_filter = UrlFilter()
+
+    def current(url):
+        parsed = urlparse(url)
+        return url_filter.reject_reason(parsed) is None, url_filter.normalize(parsed)
+
+    mismatches = [url for url in urls if legacy(url) != current(url)]
+    for url in mismatches:
+        print(f"MISMATCH {url}: legacy={legacy(url)} current={current(url)}")
+    accepted = sum(current(url)[0] for url in urls)
+    print(f"{len(urls)} urls, {accepted} accepted, {len(mismatches)} mismatches")
+
+    for name, check in (("legacy", legacy), ("url_filter", current)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for url in urls:
+                check(url)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12} {elapsed / (repeat * len(urls)) * 1e6:7.2f} us/url")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    raise SystemExit(main(args.repeat))
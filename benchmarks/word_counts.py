@@ -0,0 +1,110 @@
+''' Micro-benchmark of the scraper's word counting: the list comprehension
+    of utils.word_stats.tokenize fed to a Counter, against count_words and
+    count_words_batch, which checks the words of a batch of pages against
+    one shared vocabulary. Fails if any page's counts or their order
+    differ.
+
+    python -m benchmarks.word_counts --pages 2000 --batch 64
+    python -m benchmarks.word_counts --corpus recorded.corpus
+'''
+import random
+import time
+
+from argparse import ArgumentParser
+from collections import Counter
+
+from utils.stopwords import STOP_WORDS
+from utils.word_stats import count_words, count_words_batch, tokenize
+
+WORDS = [
+    "research", "faculty", "students", "computer", "science", "course",
+    "Informatics", "Statistics", "seminar", "lab", "ICS", "UCI", "2024",
+    "machine", "learning", "systems", "(pdf)", "e-mail:", "Irvine,", "CA",
+    "x", "#", "--", "data", "Project", "graduate", "undergraduate"]
+STOP_SHARE = 0.45
+
+
+def synthetic_texts(page_count, words_per_page, vocabulary_size=5000, seed=0):
+    # Page text with a Zipf-like word distribution over a generated
+    # vocabulary, some case and punctuation, and STOP_SHARE stop words.
+    rng = random.Random(seed)
+    vocabulary = WORDS + [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                for _ in range(rng.randint(3, 10)))
+        for _ in range(vocabulary_size)]
+    vocabulary = [word.title() if i % 3 == 0 else word
+                  for i, word in enumerate(vocabulary)]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    stop_words = sorted(STOP_WORDS)
+    texts = list()
+    for _ in range(page_count):
+        words = rng.choices(vocabulary, weights, k=words_per_page)
+        texts.append(" ".join(
+            rng.choice(stop_words) if rng.random() < STOP_SHARE else word
+            for word in words))
+    return texts
+
+
+def corpus_texts(path):
+    import cbor
+    from utils.cache_server import load_corpus
+    from utils.page_analysis import analyze_page
+    from utils.response import Response
+    texts = list()
+    for payload in load_corpus(path).values():
+        resp = Response(cbor.loads(payload))
+        if resp.status == 200 and resp.raw_response is not None:
+            texts.append(analyze_page(resp.raw_response.text).text)
+    return texts
+
+
+def legacy(texts):
+    return [Counter(tokenize(text, STOP_WORDS)) for text in texts]
+
+
+def single(texts):
+    return [count_words(text, STOP_WORDS) for text in texts]
+
+
+def batched(batch_size):
+    def count(texts):
+        counts = list()
+        for start in range(0, len(texts), batch_size):
+            counts.extend(count_words_batch(texts[start:start + batch_size], STOP_WORDS))
+        return counts
+    return count
+
+
+def main(texts, batch_size, repeat):
+    tokens = sum(len(text.split()) for text in texts)
+    print(f"{len(texts)} pages, {tokens} tokens")
+    expected = [list(counts.items()) for counts in legacy(texts)]
+    mismatches = 0
+    for count in (single, batched(batch_size)):
+        got = [list(counts.items()) for counts in count(texts)]
+        mismatches += sum(a != b for a, b in zip(expected, got))
+        mismatches += abs(len(expected) - len(got))
+    print(f"{mismatches} mismatches")
+
+    for name, count in (("tokenize", legacy), ("count_words", single),
+                        (f"batch({batch_size})", batched(batch_size))):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count(texts)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12} {elapsed / (repeat * tokens) * 1e9:7.1f} ns/token "
+              f"{elapsed / (repeat * len(texts)) * 1e6:9.1f} us/page")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    texts = (corpus_texts(args.corpus) if args.corpus
+             else synthetic_texts(args.pages, args.words))
+    raise SystemExit(main(texts, args.batch, args.repeat))
@@ -1,27 +1,52 @@
 from utils import get_logger
+from utils.metrics import metrics
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.pipeline import ParsePipeline
+from scraper import configure, get_summary_info, save_stats
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         print("Init. Crawler")
         self.config = config
         self.logger = get_logger("CRAWLER")
+        configure(config, restart)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        # In process mode the workers only download; parsing runs in a pool.
+        self.pipeline = (
+            ParsePipeline(config, self.frontier)
+            if config.parse_mode == "process" else None)
 
     def start_async(self):
+        worker_kwargs = (
+            {"pipeline": self.pipeline} if self.pipeline is not None else {})
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier)
+            self.worker_factory(
+                worker_id, self.config, self.frontier, **worker_kwargs)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
 
     def start(self):
         print("Crawler started")
+        if self.config.metrics_file:
+            metrics.start_reporter(
+                self.config.metrics_file, self.config.metrics_interval)
+        if self.config.metrics_port:
+            metrics.serve(self.config.metrics_port)
         self.start_async()
-        self.join()
+        try:
+            self.join()
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+            if hasattr(self.frontier, "close"):
+                self.frontier.close()
+            save_stats()
+            metrics.stop(self.config.metrics_file)
+        get_summary_info()
 
     def join(self):
         for worker in self.workers:
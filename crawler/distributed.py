@@ -0,0 +1,220 @@
+from hashlib import blake2b
+from multiprocessing.connection import Client, Listener
+from threading import Thread, Event, Lock
+from urllib.parse import urlparse
+
+from crawler.frontier import Frontier
+from crawler.traps import url_template
+from utils import get_logger, normalize
+import scraper
+
+
+def owner(url, node_count):
+    # The node that crawls url's host. Every url of a host goes to the same
+    # node, so per-host politeness still holds across nodes.
+    host = urlparse(url).netloc.lower()
+    return int.from_bytes(
+        blake2b(host.encode("utf-8"), digest_size=8).digest(), "big") % node_count
+
+
+def node_config(config, node_id):
+    # Give each node its own save, stats and metrics files, so several
+    # nodes can share a directory.
+    config.node_id = node_id
+    config.save_file = f"{config.save_file}.node{node_id}"
+    if config.metrics_file:
+        config.metrics_file = f"{config.metrics_file}.node{node_id}"
+    if config.record_file:
+        config.record_file = f"{config.record_file}.node{node_id}"
+    return config
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class Coordinator(object):
+    ''' Routes links between crawler nodes and decides when the crawl ends.
+
+    Nodes send the links they found outside their partition, as (url,
+    depth) pairs; each node's poll returns the links for its partition. The
+    crawl is over when every node has reported itself idle (nothing queued,
+    in flight or unsent) and no links are waiting here. Nodes only produce
+    links while busy, so that state is final. Each node then sends its analytics, which are merged
+    into one summary. '''
+    def __init__(self, config, cache_server):
+        self.logger = get_logger("COORDINATOR")
+        self.node_count = config.nodes
+        self.cache_server = cache_server
+        self.listener = Listener(
+            parse_address(config.coordinator),
+            authkey=config.user_agent.encode("utf-8"))
+        self.lock = Lock()
+        self.outboxes = [list() for _ in range(self.node_count)]
+        self.idle = [False] * self.node_count
+        self.connected = set()
+        self.lost = set()
+        self.states = dict()
+        self.forwarded = 0
+        self.done = False
+
+    def serve(self):
+        threads = list()
+        for _ in range(self.node_count):
+            connection = self.listener.accept()
+            thread = Thread(target=self._serve_node, args=(connection,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        self.listener.close()
+        self.logger.info(
+            f"Crawl finished on {len(self.states)} nodes, "
+            f"{self.forwarded} links forwarded.")
+        for node_id in sorted(self.states):
+            scraper.restore_stats_state(self.states[node_id])
+        scraper.get_summary_info(crawl_details=False)
+
+    def _serve_node(self, connection):
+        node_id = None
+        try:
+            while True:
+                message = connection.recv()
+                kind = message[0]
+                if kind == "hello":
+                    node_id = message[1]
+                    with self.lock:
+                        self.connected.add(node_id)
+                    connection.send(("hello", self.node_count, self.cache_server))
+                elif kind == "links":
+                    with self.lock:
+                        for link in message[1]:
+                            node = owner(link[0], self.node_count)
+                            if node not in self.lost:
+                                self.outboxes[node].append(link)
+                        self.forwarded += len(message[1])
+                elif kind == "poll":
+                    connection.send(self._poll(node_id, message[1]))
+                elif kind == "stats":
+                    with self.lock:
+                        self.states[node_id] = message[1]
+                    return
+        except (EOFError, OSError) as e:
+            # Links for its hosts are dropped from now on.
+            self.logger.error(f"Lost node {node_id}: {e}")
+            with self.lock:
+                if node_id is not None:
+                    self.lost.add(node_id)
+                    self.idle[node_id] = True
+                    self.outboxes[node_id] = list()
+        finally:
+            connection.close()
+
+    def _poll(self, node_id, idle):
+        with self.lock:
+            self.idle[node_id] = idle
+            if (not self.done and len(self.connected) == self.node_count
+                    and all(self.idle) and not any(self.outboxes)):
+                self.done = True
+            if self.done:
+                return ("stop",)
+            links = self.outboxes[node_id]
+            self.outboxes[node_id] = list()
+            if links:
+                self.idle[node_id] = False
+            return ("links", links)
+
+
+def connect(config):
+    # Join the coordinator; returns the connection and the cache server the
+    # coordinator registered for all nodes.
+    connection = Client(
+        parse_address(config.coordinator),
+        authkey=config.user_agent.encode("utf-8"))
+    connection.send(("hello", config.node_id))
+    _, node_count, cache_server = connection.recv()
+    assert node_count == config.nodes, "NODES differs from the coordinator's"
+    return connection, cache_server
+
+
+class DistributedFrontier(Frontier):
+    ''' Frontier of one node in a hash-partitioned crawl.
+
+    Urls whose host this node owns are queued as usual; the rest are
+    batched and forwarded to the coordinator, which hands them to their
+    owner, with its depth. A forwarded link still counts towards its parent
+    page's yield for trap detection. When the local queue runs dry, workers
+    wait for forwarded links until the coordinator ends the crawl. On close
+    the node's analytics are sent to the coordinator. '''
+    def __init__(self, config, restart, connection):
+        self.node_id = config.node_id
+        self.node_count = config.nodes
+        self.connection = connection
+        self.forward_batch = config.forward_batch
+        self.forward_interval = config.forward_interval
+        self.outbox = list()
+        self.flush_now = Event()
+        self.stopped = False
+        super().__init__(config, restart)
+        self.messenger = Thread(target=self._exchange, daemon=True)
+        self.messenger.start()
+
+    def add_url(self, url, parent=None):
+        if owner(url, self.node_count) == self.node_id:
+            super().add_url(url, parent)
+            return
+        with self.lock:
+            # Whether the owner has seen it isn't known here; it is a link
+            # off the parent's template either way.
+            if parent is not None:
+                self.traps.link_added(parent, url_template(url))
+            self.outbox.append((normalize(url), self.link_depth(parent)))
+            if len(self.outbox) >= self.forward_batch:
+                self.flush_now.set()
+
+    def get_tbd_url(self):
+        while True:
+            url = super().get_tbd_url()
+            if url is not None:
+                return url
+            with self.has_work:
+                if self.stopped:
+                    return None
+                if not self.tbd_count and not self.in_flight:
+                    # Idle here; forwarded links or the stop will wake us.
+                    self.has_work.wait(self.forward_interval)
+
+    def _exchange(self):
+        # Send our outbox, report whether we are idle, take our inbox.
+        while True:
+            self.flush_now.wait(self.forward_interval)
+            self.flush_now.clear()
+            with self.lock:
+                links, self.outbox = self.outbox, list()
+                idle = not self.tbd_count and not self.in_flight
+            try:
+                if links:
+                    self.connection.send(("links", links))
+                self.connection.send(("poll", idle))
+                reply = self.connection.recv()
+            except (EOFError, OSError) as e:
+                self.logger.error(f"Lost the coordinator: {e}")
+                reply = ("stop",)
+            if reply[0] == "stop":
+                with self.has_work:
+                    self.stopped = True
+                    self.has_work.notify_all()
+                return
+            for url, depth in reply[1]:
+                super().add_url(url, depth=depth)
+
+    def close(self):
+        super().close()
+        if self.stopped:
+            # Only after the coordinator ended the crawl; an interrupted node
+            # just disconnects and the others carry on without it.
+            self.messenger.join()
+            self.connection.send(("stats", scraper.get_stats_state()))
+        self.connection.close()
+
@@ -1,10 +1,23 @@
 import os
+import json
 import shelve
+import time
+import heapq
 
-from threading import Thread, RLock
+from array import array
+from itertools import count
+from threading import Thread, RLock, Condition
 from queue import Queue, Empty
+from urllib.parse import urlparse
 
+from crawler.journal import FrontierJournal
+from crawler.priority import UrlScorer
+from crawler.robots import HostPolicies
+from crawler.segments import SegmentQueue
+from crawler.traps import TrapDetector, url_template
 from utils import get_logger, get_urlhash, normalize
+from utils.metrics import metrics
+from utils.seen import make_seen_set
 from scraper import is_valid
 
 class Frontier(object):
@@ -12,7 +25,59 @@ class Frontier(object):
         print("Init. Frontier")
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # All frontier state is guarded by this lock; workers wait on has_work.
+        self.lock = RLock()
+        self.has_work = Condition(self.lock)
+        # host -> heap of (-score, seq, depth, url) waiting to be downloaded
+        # from that host, best score first.
+        self.host_queues = dict()
+        # (ready time, host) for idle hosts still in their politeness delay.
+        self.waiting_heap = list()
+        # ((-best score, seq), host) for idle hosts that may be fetched now.
+        self.ready_heap = list()
+        # host -> key of its live ready_heap entry, None while in waiting_heap.
+        self.scheduled_hosts = dict()
+        # host -> earliest monotonic time the next request to it may start.
+        self.host_ready = dict()
+        # url -> (host, depth) for downloads handed out but not yet completed.
+        self.in_flight = dict()
+        self.active_hosts = set()
+        # urls to be downloaded; queued of them are in memory, the rest in
+        # the overflow segment queue on disk.
+        self.tbd_count = 0
+        self.queued = 0
+        self.sequence = count()
+        # urlhashes of every url ever discovered, kept as compact digests so
+        # duplicate checks never go to the shelve.
+        self.seen = make_seen_set(
+            self.config.seen_set, self.config.bloom_capacity)
+        # Learns url templates that stop yielding new urls and cuts them off.
+        self.traps = TrapDetector(
+            self.config.trap_window, self.config.trap_min_yield,
+            self.config.trap_template_budget)
+        self.scorer = UrlScorer(self.traps)
+        # robots.txt rules and crawl delays per host; sitemap urls come back
+        # through add_sitemap_urls.
+        self.policies = HostPolicies(self.config, self.add_sitemap_urls)
+        self.journal_file = f"{self.config.save_file}.journal"
+        # Lowest-priority urls beyond memory_limit wait on disk in a segment
+        # queue and are read back, oldest first, when memory runs low.
+        self.memory_limit = self.config.frontier_memory
+        self.queue_dir = f"{self.config.save_file}.queue"
+        self.seen_file = f"{self.config.save_file}.seen"
+        # Written last by close(): the queue and seen files then match the
+        # save file, so the next run resumes from them without scanning it.
+        self.resume_file = f"{self.config.save_file}.resume"
+        metrics.gauge("frontier.pending", lambda: self.tbd_count)
+        metrics.gauge("frontier.in_flight", lambda: len(self.in_flight))
+        metrics.gauge("frontier.spilled", lambda: len(self.overflow))
+        metrics.gauge("frontier.hosts_queued", lambda: len(self.host_queues))
+        metrics.gauge("frontier.seen", lambda: len(self.seen))
+        metrics.gauge("frontier.seen_bytes", lambda: self.seen.memory_bytes())
+        metrics.gauge("frontier.trap_templates", lambda: len(self.traps.blocked))
+        metrics.gauge("frontier.trap_rejected", lambda: self.traps.rejected)
+        metrics.gauge("frontier.robots_hosts", lambda: len(self.policies))
+        metrics.gauge("frontier.robots_disallowed", lambda: self.policies.disallowed)
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
@@ -24,11 +89,32 @@ class Frontier(object):
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
             os.remove(self.config.save_file)
+        if restart and os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
         # Load existing save file, or create one if it does not exist.
         self.save = shelve.open(self.config.save_file)
+        # Frontier changes go through the journal; it replays anything an
+        # earlier run flushed but did not compact before we read the save.
+        self.journal = FrontierJournal(
+            self.save, self.journal_file, self.config.save_batch,
+            self.config.save_interval)
+        if self.journal.replayed:
+            self.logger.info(
+                f"Recovered {self.journal.replayed} frontier changes from "
+                f"{self.journal_file}.")
+        resume = (
+            not restart and not self.journal.replayed
+            and os.path.exists(self.resume_file)
+            and os.path.exists(self.seen_file))
+        if os.path.exists(self.resume_file):
+            # From here on a crash leaves the queue behind the save file.
+            os.remove(self.resume_file)
+        self.overflow = SegmentQueue(self.queue_dir, resume=resume)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
+        elif resume:
+            self._resume()
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
@@ -40,34 +126,227 @@ class Frontier(object):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        with self.lock:
+            for urlhash, entry in self.save.items():
+                # (url, completed, score, depth); older saves lack the last two.
+                url, completed = entry[:2]
+                self.seen.add(urlhash)
+                if not completed and is_valid(url):
+                    if len(entry) >= 4:
+                        score, depth = entry[2:4]
+                    else:
+                        depth = 0
+                        score = self.scorer.score(url, depth, url_template(url))
+                    self._enqueue(url, depth, score)
+                    tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
+        self.logger.info(
+            f"Seen-set holds {len(self.seen)} urls in "
+            f"{self.seen.memory_bytes()} bytes.")
+
+    def _resume(self):
+        # Pick up the pending urls and seen-set written by the last close(),
+        # reading only the pending queue segments.
+        with self.lock:
+            digests = array("Q")
+            with open(self.seen_file, "rb") as seen_file:
+                digests.frombytes(seen_file.read())
+            for value in digests:
+                self.seen.add_digest(value)
+            self.tbd_count = len(self.overflow)
+            self._refill()
+        self.logger.info(
+            f"Resumed {self.tbd_count} urls to be downloaded and "
+            f"{len(self.seen)} seen urls from {self.queue_dir}.")
+
+    def _post(self, host):
+        # Offer the host's best url on the ready heap; older entries go stale.
+        key = self.host_queues[host][0][:2]
+        self.scheduled_hosts[host] = key
+        heapq.heappush(self.ready_heap, (key, host))
+
+    def _schedule(self, host):
+        # Put an idle host with queued urls back on the ready or waiting heap.
+        if (host in self.host_queues and host not in self.scheduled_hosts
+                and host not in self.active_hosts):
+            ready_time = self.host_ready.get(host, 0)
+            if ready_time <= time.monotonic():
+                self._post(host)
+            else:
+                heapq.heappush(self.waiting_heap, (ready_time, host))
+                self.scheduled_hosts[host] = None
+            self.has_work.notify()
+
+    def _enqueue(self, url, depth, score):
+        host = urlparse(url).netloc
+        entry = (-score, next(self.sequence), depth, url)
+        heapq.heappush(self.host_queues.setdefault(host, list()), entry)
+        self.tbd_count += 1
+        self.queued += 1
+        key = self.scheduled_hosts.get(host)
+        if key is not None and entry[:2] < key:
+            self._post(host)
+        self._schedule(host)
+        if self.memory_limit and self.queued > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        # Move the lowest-scored quarter of the in-memory queue to disk.
+        entries = [
+            (entry, host) for host, queue in self.host_queues.items()
+            for entry in queue]
+        entries.sort()
+        keep = self.memory_limit * 3 // 4
+        self.overflow.push_many(
+            [-entry[0], entry[2], entry[3]] for entry, _ in entries[keep:])
+        self.queued = keep
+        # A sorted list is a valid heap, so the kept urls need no heapify.
+        self.host_queues = dict()
+        for entry, host in entries[:keep]:
+            self.host_queues.setdefault(host, list()).append(entry)
+        self.ready_heap = list()
+        self.waiting_heap = list()
+        self.scheduled_hosts = dict()
+        for host in self.host_queues:
+            self._schedule(host)
+
+    def _refill(self):
+        # Read the next overflow urls back; half of memory_limit at a time,
+        # so a refill never spills again.
+        if self.memory_limit:
+            records = self.overflow.pop_many(max(1, self.memory_limit // 2))
+        else:
+            records = self.overflow.pop_many(len(self.overflow))
+        for score, depth, url in records:
+            self.tbd_count -= 1
+            self._enqueue(url, depth, score)
 
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Blocks until a host is free and past its politeness delay, then
+            hands out the best-scored url among such hosts. Returns None only when nothing is queued and nothing is in flight,
+            since an in-flight download can still add urls. '''
+        with self.has_work:
+            while True:
+                if len(self.overflow) and self.queued <= self.memory_limit // 4:
+                    self._refill()
+                now = time.monotonic()
+                while self.waiting_heap and self.waiting_heap[0][0] <= now:
+                    _, host = heapq.heappop(self.waiting_heap)
+                    self._post(host)
+                if self.ready_heap:
+                    key, host = heapq.heappop(self.ready_heap)
+                    if self.scheduled_hosts.get(host) != key:
+                        # Superseded by an entry for a better url.
+                        continue
+                    del self.scheduled_hosts[host]
+                    queue = self.host_queues[host]
+                    _, _, depth, url = heapq.heappop(queue)
+                    if not queue:
+                        del self.host_queues[host]
+                    self.tbd_count -= 1
+                    self.queued -= 1
+                    template = url_template(url)
+                    if not self.traps.allowed(template):
+                        # Queued before its template was cut off; drop it.
+                        self.journal[get_urlhash(url)] = (url, True)
+                        self._schedule(host)
+                        continue
+                    self.traps.started(url, template)
+                    self.in_flight[url] = (host, depth)
+                    self.active_hosts.add(host)
+                    return url
+                if self.waiting_heap:
+                    self.has_work.wait(self.waiting_heap[0][0] - now)
+                    continue
+                if not self.in_flight:
+                    # Wake the other workers so they can stop too.
+                    self.has_work.notify_all()
+                    return None
+                self.has_work.wait()
 
-    def add_url(self, url):
+    def add_url(self, url, parent=None, depth=None):
+        # parent is the downloaded url the link was found on, if any; depth
+        # is given instead for a link found on another node.
         url = normalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        template = url_template(url)
+        with metrics.timer("frontier.add_url"), self.lock:
+            if not self.traps.allowed(template):
+                return
+            if self.policies.known_disallowed(url):
+                return
+            if self.seen.add(urlhash):
+                if depth is None:
+                    depth = self.link_depth(parent)
+                score = round(self.scorer.score(url, depth, template), 3)
+                self.journal[urlhash] = (url, False, score, depth)
+                self._enqueue(url, depth, score)
+                if parent is not None:
+                    self.traps.link_added(parent, template)
     
-    def mark_url_complete(self, url):
+    def link_depth(self, parent):
+        # One level deeper than the page a link was found on. Call with the
+        # lock held.
+        flight = self.in_flight.get(parent)
+        return flight[1] + 1 if flight is not None else 0
+
+    def add_urls(self, urls, parent=None):
+        # Many urls under one lock acquisition.
+        with self.lock:
+            for url in urls:
+                self.add_url(url, parent)
+
+    def add_sitemap_urls(self, urls):
+        # Sitemaps list urls of any kind; keep those the scraper would.
+        self.add_urls([url for url in urls if is_valid(url)])
+
+    def mark_url_complete(self, url, new_content=False):
+        # new_content: the page was scraped as new, non-duplicate content.
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with metrics.timer("frontier.mark_url_complete"), self.lock:
+            if urlhash not in self.seen:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+
+            self.journal[urlhash] = (url, True)
+
+            template = self.traps.completed(url, new_content)
+            if template is not None:
+                self.logger.info(
+                    f"Cutting off url template {template}: no new urls "
+                    f"outside it or new content from its last pages.")
+
+            # The host may be fetched again once its politeness delay passes.
+            host, _ = self.in_flight.pop(url, (None, 0))
+            if host is not None:
+                self.active_hosts.discard(host)
+                self.host_ready[host] = time.monotonic() + max(
+                    self.config.time_delay, self.policies.crawl_delay(host))
+                self._schedule(host)
+            self.has_work.notify_all()
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+    def close(self):
+        # Flush the last batch and compact the journal into the save file.
+        with self.lock:
+            self.logger.info(f"Trap detection: {self.traps.summary()}")
+            self.logger.info(f"Robots.txt: {self.policies.summary()}")
+            self.journal.close()
+            self.save.close()
+            # Everything still pending goes to the segment queue, so the next
+            # run reads that instead of every url in the save file.
+            pending = [
+                [-entry[0], entry[2], entry[3]]
+                for queue in self.host_queues.values() for entry in sorted(queue)]
+            pending.extend(
+                [self.scorer.score(url, depth, url_template(url)), depth, url]
+                for url, (_, depth) in self.in_flight.items())
+            self.overflow.push_many(pending)
+            self.overflow.checkpoint()
+            self.overflow.close()
+            with open(self.seen_file, "wb") as seen_file:
+                array("Q", self.seen.digests()).tofile(seen_file)
+            with open(self.resume_file, "w", encoding="utf-8") as resume_file:
+                json.dump({"pending": len(self.overflow)}, resume_file)
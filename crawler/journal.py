@@ -0,0 +1,91 @@
+import os
+import json
+import time
+
+
+class FrontierJournal(object):
+    ''' Write-behind layer in front of the frontier shelve.
+
+    Mutations are kept in memory and appended to a journal file in batches,
+    flushed every batch_size records or flush_interval seconds. Every
+    compact_every flushes the pending records are written into the shelve,
+    synced once, and the journal is truncated. A crash loses at most the
+    batch that had not been flushed yet. '''
+    def __init__(self, save, journal_file, batch_size=100, flush_interval=5.0,
+                 compact_every=10):
+        self.save = save
+        self.journal_file = journal_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        # urlhash -> (url, completed, ...) not yet compacted into the shelve.
+        self.pending = dict()
+        # Journal lines not yet written to disk.
+        self.buffer = list()
+        self.flushes = 0
+        self.last_flush = time.monotonic()
+        self.replayed = self._replay()
+        self.journal = open(self.journal_file, "w", encoding="utf-8")
+
+    def _replay(self):
+        # Apply whatever an earlier run flushed but never compacted.
+        if not os.path.exists(self.journal_file):
+            return 0
+        count = 0
+        with open(self.journal_file, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    urlhash, *value = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write.
+                    break
+                self.save[urlhash] = tuple(value)
+                count += 1
+        self.save.sync()
+        return count
+
+    def __contains__(self, urlhash):
+        return urlhash in self.pending or urlhash in self.save
+
+    def __getitem__(self, urlhash):
+        if urlhash in self.pending:
+            return self.pending[urlhash]
+        return self.save[urlhash]
+
+    def __setitem__(self, urlhash, value):
+        self.pending[urlhash] = tuple(value)
+        self.buffer.append(json.dumps([urlhash, *value]))
+        if (len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def __len__(self):
+        return len(self.save) + sum(
+            1 for urlhash in self.pending if urlhash not in self.save)
+
+    def flush(self):
+        if self.buffer:
+            self.journal.write("\n".join(self.buffer) + "\n")
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.buffer.clear()
+            self.flushes += 1
+        self.last_flush = time.monotonic()
+        if self.flushes >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # The shelve is synced before the journal is dropped, so a crash in
+        # between only replays records that are already stored.
+        for urlhash, value in self.pending.items():
+            self.save[urlhash] = value
+        self.save.sync()
+        self.pending.clear()
+        self.journal.seek(0)
+        self.journal.truncate()
+        self.flushes = 0
+
+    def close(self):
+        self.flush()
+        self.compact()
+        self.journal.close()
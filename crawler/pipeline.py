@@ -0,0 +1,68 @@
+import os
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore
+
+from utils import get_logger, forward_child_logs, log_to_queue
+import scraper
+
+
+class ParsePipeline(object):
+    ''' Parses downloaded pages in a pool of processes.
+
+    Fetcher threads submit (url, resp) and go straight back to downloading.
+    scraper.process_page runs in a child process; its PageResult, and the
+    skip and cache counters the child advanced, are merged into the crawl
+    statistics and the frontier back in this process, after which the url
+    is marked complete. Log records of the children are forwarded to this
+    process's log listener. '''
+    def __init__(self, config, frontier):
+        self.logger = get_logger("PIPELINE")
+        self.frontier = frontier
+        processes = config.parse_processes or os.cpu_count() or 1
+        # Not fork: the pool starts its children lazily from a worker thread,
+        # and a fork then could copy a lock another thread holds.
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn")
+        self.log_queue, self.log_forwarder = forward_child_logs(context)
+        self.pool = ProcessPoolExecutor(
+            max_workers=processes, mp_context=context,
+            initializer=log_to_queue, initargs=(self.log_queue,))
+        # Bound the pages waiting to be parsed so fetchers can't run ahead
+        # and hold every downloaded body in memory.
+        self.slots = BoundedSemaphore(2 * processes)
+
+    def submit(self, url, resp):
+        # Cheap rejections happen here so those pages are never sent over.
+        if scraper.prefilter.check(url, resp) is not None:
+            self.frontier.mark_url_complete(url)
+            return
+        self.slots.acquire()
+        try:
+            future = self.pool.submit(scraper.process_page_counted, url, resp)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda future: self._merge(url, future))
+
+    def _merge(self, url, future):
+        new_content = False
+        try:
+            result, counts = future.result()
+            scraper.merge_counts(counts)
+            if result is not None:
+                for scraped_url in scraper.merge_page_result(result):
+                    self.frontier.add_url(scraped_url, url)
+                new_content = result.new_content
+        except Exception as e:
+            self.logger.error(f"Failed to parse {url}: {e}")
+        finally:
+            self.frontier.mark_url_complete(url, new_content)
+            self.slots.release()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        # the children are gone, so everything they logged is queued
+        self.log_forwarder.stop()
@@ -0,0 +1,35 @@
+from urllib.parse import urlparse
+
+# Weights of the url score; higher scores are downloaded first.
+DEPTH_WEIGHT = 1.0
+SEGMENT_WEIGHT = 0.25
+QUERY_PENALTY = 0.5
+LENGTH_WEIGHT = 1 / 200
+HOST_YIELD_WEIGHT = 1.0
+TEMPLATE_YIELD_WEIGHT = 2.0
+
+
+class UrlScorer(object):
+    ''' Best-first priority of a url.
+
+    Short, shallow urls close to the seeds come first. Urls with many path
+    segments or a query string come later, as do urls from hosts and url
+    templates whose recent pages yielded few new urls, as measured by the
+    TrapDetector. Unknown hosts and templates get the benefit of the
+    doubt. '''
+    def __init__(self, traps):
+        self.traps = traps
+
+    def score(self, url, depth, template):
+        parsed = urlparse(url)
+        score = (
+            - DEPTH_WEIGHT * depth
+            - SEGMENT_WEIGHT * parsed.path.rstrip("/").count("/")
+            - LENGTH_WEIGHT * len(url))
+        if parsed.query:
+            score -= QUERY_PENALTY
+        host = self.traps.hosts.get(parsed.netloc)
+        score += HOST_YIELD_WEIGHT * (host.recent_yield() if host else 1.0)
+        stats = self.traps.templates.get(template)
+        score += TEMPLATE_YIELD_WEIGHT * (stats.recent_yield() if stats else 1.0)
+        return score
@@ -0,0 +1,270 @@
+import re
+import time
+import zlib
+
+from threading import Event, Lock
+from urllib.parse import urlparse, urljoin
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+from utils.download import download
+from utils.metrics import metrics
+
+# Longest Crawl-delay honoured; some hosts ask for hours between requests.
+MAX_CRAWL_DELAY = 60.0
+# Sitemap files read per host, counting nested sitemap indexes.
+MAX_SITEMAPS = 20
+# The sitemap protocol's own limit on an uncompressed sitemap.
+MAX_SITEMAP_BYTES = 50 * 2 ** 20
+# Seconds before a robots.txt that could not be fetched is tried again.
+RETRY_TTL = 300.0
+
+
+def _compile(pattern):
+    # A robots.txt path pattern: * matches anything, a trailing $ anchors.
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.compile(regex + ("$" if anchored else ""))
+
+
+class RobotsPolicy(object):
+    ''' What robots.txt says for our user agent.
+
+    Allow and Disallow rules are compiled once and kept longest pattern
+    first, so the first match decides (RFC 9309: the most specific rule
+    wins, Allow on a tie). crawl_delay is in seconds; sitemaps are the
+    Sitemap urls listed anywhere in the file. The default policy, for hosts
+    without a robots.txt, allows everything. '''
+    def __init__(self, rules=(), crawl_delay=0.0, sitemaps=()):
+        self.rules = [
+            (_compile(pattern), allow) for pattern, allow in
+            sorted(rules, key=lambda rule: (-len(rule[0]), not rule[1]))]
+        self.crawl_delay = min(crawl_delay, MAX_CRAWL_DELAY)
+        self.sitemaps = list(sitemaps)
+
+    def allowed(self, url):
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        for matcher, allow in self.rules:
+            if matcher.match(path):
+                return allow
+        return True
+
+
+def parse_robots(text, user_agent):
+    # The RobotsPolicy of the groups naming our user agent, or else of the
+    # groups for *. Groups start with one or more User-agent lines.
+    agent = user_agent.lower()
+    groups = list()
+    sitemaps = list()
+    in_agents = False
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        field, _, value = line.partition(":")
+        field, value = field.strip().lower(), value.strip()
+        if not value and field != "disallow":
+            continue
+        if field == "sitemap":
+            sitemaps.append(value)
+            continue
+        if field == "user-agent":
+            if not in_agents:
+                groups.append(([], [], []))
+                in_agents = True
+            groups[-1][0].append(value.lower())
+            continue
+        if not groups:
+            continue
+        in_agents = False
+        if field in ("allow", "disallow") and value:
+            groups[-1][1].append((value, field == "allow"))
+        elif field == "crawl-delay":
+            try:
+                groups[-1][2].append(float(value))
+            except ValueError:
+                pass
+    ours = [group for group in groups
+            if any(name != "*" and name in agent for name in group[0])]
+    if not ours:
+        ours = [group for group in groups if "*" in group[0]]
+    rules = [rule for group in ours for rule in group[1]]
+    delays = [delay for group in ours for delay in group[2]]
+    return RobotsPolicy(rules, max(delays, default=0.0), sitemaps)
+
+
+def parse_sitemap(content):
+    # (page urls, sitemap urls) of a sitemap, a sitemap index, or a plain
+    # list of urls, gzipped or not.
+    if content[:2] == b"\x1f\x8b":
+        try:
+            content = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(
+                content, MAX_SITEMAP_BYTES)
+        except zlib.error:
+            return [], []
+    if content.lstrip(b"\xef\xbb\xbf \t\r\n")[:1] != b"<":
+        lines = content.decode("utf-8", "replace").splitlines()
+        return [line.strip() for line in lines if line.strip().startswith("http")], []
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    locs = list()
+    try:
+        parser.feed(content)
+        for event, element in parser.read_events():
+            tag = element.tag.rpartition("}")[2]
+            if event == "start":
+                if root is None:
+                    root = tag
+            elif tag == "loc" and element.text:
+                locs.append(element.text.strip())
+            elif tag in ("url", "sitemap"):
+                element.clear()
+    except ParseError:
+        pass
+    if root == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+class HostPolicies(object):
+    ''' robots.txt of every host, fetched once per ttl seconds.
+
+    allowed() fetches a host's robots.txt through the cache server on the
+    first url of that host a worker gets, and keeps the parsed policy for
+    later urls. The first time, the sitemaps it lists are read as well and
+    their urls handed to add_urls in bulk. Each request to the host waits
+    out the host's delay, since the worker then downloads the url itself.
+    Hosts whose robots.txt can't be fetched are allowed everything. Thread
+    safe; concurrent first urls of one host fetch robots.txt once. '''
+    def __init__(self, config, add_urls, fetch=download):
+        self.config = config
+        self.ttl = config.robots_ttl
+        self.sitemap_max_urls = config.sitemap_max_urls
+        self.add_urls = add_urls
+        self.fetch = fetch
+        self.lock = Lock()
+        # host -> (RobotsPolicy, monotonic expiry time)
+        self.policies = dict()
+        # host -> Event set once its robots.txt has been fetched
+        self.fetching = dict()
+        self.sitemaps_read = set()
+        self.disallowed = 0
+        self.sitemap_urls = 0
+
+    def __len__(self):
+        return len(self.policies)
+
+    def _cached(self, host):
+        # The host's policy if known and fresh; callers hold the lock.
+        entry = self.policies.get(host)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def known_disallowed(self, url):
+        # True if url's host policy is already known and disallows url.
+        if not self.ttl:
+            return False
+        with self.lock:
+            policy = self._cached(urlparse(url).netloc)
+        return policy is not None and not policy.allowed(url)
+
+    def crawl_delay(self, host):
+        with self.lock:
+            policy = self._cached(host)
+        return policy.crawl_delay if policy is not None else 0.0
+
+    def allowed(self, url, logger=None):
+        if not self.ttl:
+            return True
+        policy = self._policy(urlparse(url), logger)
+        if policy.allowed(url):
+            return True
+        with self.lock:
+            self.disallowed += 1
+        return False
+
+    def _policy(self, parsed, logger):
+        host = parsed.netloc
+        while True:
+            with self.lock:
+                policy = self._cached(host)
+                if policy is not None:
+                    return policy
+                event = self.fetching.get(host)
+                if event is None:
+                    event = self.fetching[host] = Event()
+                    break
+            event.wait()
+        policy, ttl = RobotsPolicy(), min(self.ttl, RETRY_TTL)
+        try:
+            policy, ttl = self._fetch_robots(
+                f"{parsed.scheme}://{host}/robots.txt", logger)
+        finally:
+            with self.lock:
+                self.policies[host] = (policy, time.monotonic() + ttl)
+                del self.fetching[host]
+            event.set()
+        if policy.sitemaps and self.sitemap_max_urls and host not in self.sitemaps_read:
+            self.sitemaps_read.add(host)
+            self._read_sitemaps(host, policy, logger)
+        return policy
+
+    def _get(self, url, policy, logger):
+        # Body of url, or None; then wait as if the url had been crawled.
+        with metrics.timer("robots.fetch"):
+            resp = self.fetch(url, self.config, logger)
+        time.sleep(max(self.config.time_delay, policy.crawl_delay))
+        if resp.status != 200 or resp.raw_response is None:
+            return None
+        return resp.raw_response.content or None
+
+    def _fetch_robots(self, url, logger):
+        # (policy, seconds to keep it). If the fetch or the parse fails the
+        # host is allowed everything, but only until a retry after RETRY_TTL.
+        try:
+            content = self._get(url, RobotsPolicy(), logger)
+            if content is None:
+                return RobotsPolicy(), self.ttl
+            policy = parse_robots(
+                content.decode("utf-8", "replace"), self.config.user_agent)
+        except Exception as e:
+            if logger is not None:
+                logger.error(f"Failed to read {url}, retrying in {RETRY_TTL}s: {e}")
+            return RobotsPolicy(), min(self.ttl, RETRY_TTL)
+        if logger is not None:
+            logger.info(
+                f"Read {url}: {len(policy.rules)} rules, crawl delay "
+                f"{policy.crawl_delay}s, {len(policy.sitemaps)} sitemaps.")
+        return policy, self.ttl
+
+    def _read_sitemaps(self, host, policy, logger):
+        # Breadth first through sitemap indexes, up to MAX_SITEMAPS files
+        # and sitemap_max_urls urls; urls the host disallows are left out.
+        queue = list(policy.sitemaps)
+        urls = list()
+        read = 0
+        while queue and read < MAX_SITEMAPS and len(urls) < self.sitemap_max_urls:
+            sitemap = queue.pop(0)
+            read += 1
+            content = self._get(sitemap, policy, logger)
+            if content is None:
+                continue
+            pages, sitemaps = parse_sitemap(content)
+            queue.extend(urljoin(sitemap, child) for child in sitemaps)
+            urls.extend(
+                url for url in pages
+                if urlparse(url).netloc != host or policy.allowed(url))
+        urls = urls[:self.sitemap_max_urls]
+        with self.lock:
+            self.sitemap_urls += len(urls)
+        if logger is not None:
+            logger.info(f"Found {len(urls)} urls in {read} sitemaps of {host}.")
+        if urls:
+            self.add_urls(urls)
+
+    def summary(self):
+        return (f"{len(self.policies)} hosts, {self.disallowed} urls disallowed, "
+                f"{self.sitemap_urls} urls from sitemaps")
@@ -0,0 +1,104 @@
+import os
+import json
+
+
+class SegmentQueue(object):
+    ''' FIFO of JSON records kept on disk in append-only segment files.
+
+    Records are appended to the tail segment, which is rotated every
+    segment_size records. They are read back sequentially from the head
+    segment, and a segment is deleted once it has been read. Memory use is
+    two open files whatever the queue length. checkpoint() saves the read
+    position so that a later SegmentQueue(directory, resume=True) continues
+    where this one stopped, touching only the segments still pending. '''
+    def __init__(self, directory, segment_size=10000, resume=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.state_file = os.path.join(directory, "state.json")
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        state = None
+        if resume and os.path.exists(self.state_file):
+            with open(self.state_file, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        if state is None:
+            self.clear()
+        else:
+            self.head = state["head"]
+            self.offset = state["offset"]
+            self.tail = state["tail"]
+            self.tail_records = state["tail_records"]
+            self.count = state["count"]
+            self.writer = open(self._path(self.tail), "ab")
+        self.reader = None
+
+    def _path(self, index):
+        return os.path.join(self.directory, f"{index:08d}.seg")
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".seg"):
+                os.remove(os.path.join(self.directory, name))
+        self.head = self.tail = 0
+        self.offset = 0
+        self.tail_records = 0
+        self.count = 0
+        self.writer = open(self._path(self.tail), "ab")
+        self.reader = None
+
+    def __len__(self):
+        return self.count
+
+    def push_many(self, records):
+        for record in records:
+            if self.tail_records >= self.segment_size:
+                self.writer.close()
+                self.tail += 1
+                self.tail_records = 0
+                self.writer = open(self._path(self.tail), "ab")
+            self.writer.write(json.dumps(record).encode("utf-8") + b"\n")
+            self.tail_records += 1
+            self.count += 1
+
+    def pop_many(self, n):
+        # Up to n records, oldest first.
+        records = list()
+        while len(records) < n and self.count:
+            if self.reader is None:
+                if self.head == self.tail:
+                    self.writer.flush()
+                self.reader = open(self._path(self.head), "rb")
+                self.reader.seek(self.offset)
+            line = self.reader.readline()
+            if line:
+                records.append(json.loads(line))
+                self.offset = self.reader.tell()
+                self.count -= 1
+                continue
+            # End of the head segment: drop it, unless it is still written to.
+            self.reader.close()
+            self.reader = None
+            if self.head == self.tail:
+                break
+            os.remove(self._path(self.head))
+            self.head += 1
+            self.offset = 0
+        return records
+
+    def checkpoint(self):
+        # Written aside and renamed, so a crash leaves no half-written state.
+        self.writer.flush()
+        os.fsync(self.writer.fileno())
+        state = {
+            "head": self.head, "offset": self.offset, "tail": self.tail,
+            "tail_records": self.tail_records, "count": self.count}
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_file, self.state_file)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        self.writer.close()
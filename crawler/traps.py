@@ -0,0 +1,133 @@
+import re
+
+from collections import deque
+from urllib.parse import urlparse, parse_qsl
+
+_DATE = re.compile(r"\d{4}-\d{1,2}(?:-\d{1,2})?|\d{1,2}-\d{1,2}-\d{4}")
+_DIGITS = re.compile(r"\d+")
+# Hex ids and hashes (with at least one digit), UUIDs, and long opaque tokens.
+_ID = re.compile(
+    r"(?=[a-f]*\d)[0-9a-f]{8,}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}",
+    re.IGNORECASE)
+MAX_SEGMENT = 40
+
+
+def _collapse(part):
+    if len(part) > MAX_SEGMENT or _ID.fullmatch(part):
+        return "{id}"
+    return _DIGITS.sub("{n}", _DATE.sub("{date}", part))
+
+
+def url_template(url):
+    ''' The url with its variable parts collapsed: dates, numbers and ids in
+        path segments and query values. Query keys are sorted, so
+        ?rev=3&id=x and ?id=x&rev=4 share the template host/path?id=x&rev={n}.
+        Words are kept, so different wiki pages stay different templates. '''
+    parsed = urlparse(url)
+    template = parsed.netloc.lower() + "/".join(
+        _collapse(segment) for segment in parsed.path.split("/"))
+    if parsed.query:
+        template += "?" + "&".join(
+            f"{key}={_collapse(value)}"
+            for key, value in sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return template
+
+
+class YieldStats(object):
+    # What the pages of one template (or host) produced.
+    def __init__(self, window):
+        self.pages = 0
+        self.productive = 0
+        self.new_links = 0
+        self.new_content = 0
+        # productive flags of the last window pages
+        self.recent = deque(maxlen=window)
+
+    def add(self, new_links, new_content):
+        productive = new_links > 0 or new_content
+        self.pages += 1
+        self.productive += productive
+        self.new_links += new_links
+        self.new_content += new_content
+        self.recent.append(productive)
+
+    def recent_yield(self):
+        return sum(self.recent) / len(self.recent) if self.recent else 1.0
+
+
+class TrapDetector(object):
+    ''' Learns which url templates are crawler traps.
+
+    A downloaded page is productive if it led the frontier to at least one
+    new url outside its own template, or added new content: a new url whose
+    page was not a copy or near-copy of one already crawled (the scraper's
+    duplicate verdict). Paging through an archive or a revision history
+    only leads to more of the same template and mostly repeats content,
+    and an error or unparsed page yields nothing. Once a
+    template has downloaded window pages and fewer than min_yield of the
+    last window were productive, it is cut off: its urls are no longer
+    admitted or handed out. template_budget, when set, also caps the pages
+    downloaded per template. Not thread safe; the frontier calls it under
+    its lock. '''
+    def __init__(self, window=50, min_yield=0.02, template_budget=0):
+        self.window = window
+        self.min_yield = min_yield
+        self.template_budget = template_budget
+        self.templates = dict()
+        self.hosts = dict()
+        self.blocked = set()
+        # url in flight -> [template, host, new urls outside the template so far]
+        self.pending = dict()
+        self.rejected = 0
+
+    def allowed(self, template):
+        if template in self.blocked:
+            self.rejected += 1
+            return False
+        return True
+
+    def started(self, url, template):
+        self.pending[url] = [template, urlparse(url).netloc, 0]
+
+    def link_added(self, parent, template):
+        # A url found on parent was new to the frontier.
+        entry = self.pending.get(parent)
+        if entry is not None and entry[0] != template:
+            entry[2] += 1
+
+    def completed(self, url, new_content=False):
+        # Record the page's yield; returns its template if that got cut off.
+        entry = self.pending.pop(url, None)
+        if entry is None:
+            return None
+        template, host, new_links = entry
+        stats = self.templates.get(template)
+        if stats is None:
+            stats = self.templates[template] = YieldStats(self.window)
+        stats.add(new_links, new_content)
+        host_stats = self.hosts.get(host)
+        if host_stats is None:
+            host_stats = self.hosts[host] = YieldStats(self.window)
+        host_stats.add(new_links, new_content)
+        if template in self.blocked:
+            return None
+        if ((len(stats.recent) == self.window
+                and stats.recent_yield() < self.min_yield)
+                or (self.template_budget and stats.pages >= self.template_budget)):
+            self.blocked.add(template)
+            return template
+        return None
+
+    def summary(self, n=10):
+        # The n templates with the most downloaded pages.
+        largest = sorted(
+            self.templates.items(), key=lambda item: item[1].pages, reverse=True)[:n]
+        return {
+            "templates": len(self.templates),
+            "blocked": len(self.blocked),
+            "rejected_urls": self.rejected,
+            "largest": [
+                (template, stats.pages, stats.productive, stats.new_links,
+                 stats.new_content, template in self.blocked)
+                for template, stats in largest],
+        }
@@ -1,39 +1,70 @@
 from threading import Thread
 
+from functools import lru_cache
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.metrics import metrics
 import scraper
-import time
+
+
+@lru_cache(maxsize=None)
+def check_scraper_source():
+    # basic check for requests in scraper, once per process
+    source = getsource(scraper)
+    assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+    assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier):
+    def __init__(self, worker_id, config, frontier, pipeline=None):
         print("Init. Worker")
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        # When set, pages are parsed by the pipeline's processes.
+        self.pipeline = pipeline
+        check_scraper_source()
         super().__init__(daemon=True)
         
     def run(self):
         print("Starting Crawl!")
 
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            new_content = False
+            # Blocks while other workers may still add urls; politeness per
+            # host is enforced by the frontier, not by sleeping here.
+            with metrics.timer("worker.wait"):
+                tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
-                #TODO: Print summary info after crawl finishes
-                scraper.get_summary_info()
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            try:
+                # Fetches the host's robots.txt on its first url.
+                with metrics.timer("worker.robots"):
+                    allowed = self.frontier.policies.allowed(tbd_url, self.logger)
+                if not allowed:
+                    self.logger.info(f"Skipping {tbd_url}, disallowed by robots.txt.")
+                    self.frontier.mark_url_complete(tbd_url)
+                    continue
+                with metrics.timer("worker.download"):
+                    resp = download(tbd_url, self.config, self.logger)
+                metrics.increment("pages")
+                metrics.increment("bytes", resp.raw_size)
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.")
+                if self.pipeline is not None:
+                    # The pipeline adds the links and completes the url.
+                    with metrics.timer("worker.submit"):
+                        self.pipeline.submit(tbd_url, resp)
+                    continue
+                with metrics.timer("worker.scrape"):
+                    scraped_urls, new_content = scraper.scrape_page(tbd_url, resp)
+                with metrics.timer("worker.add_urls"):
+                    for scraped_url in scraped_urls:
+                        self.frontier.add_url(scraped_url, tbd_url)
+            except Exception as e:
+                metrics.increment("errors")
+                self.logger.error(f"Failed to crawl {tbd_url}: {e}")
+            self.frontier.mark_url_complete(tbd_url, new_content)
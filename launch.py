@@ -1,17 +1,67 @@
+import sys
+import subprocess
+
 from configparser import ConfigParser
 from argparse import ArgumentParser
+from functools import partial
 
-from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
 
 
-def main(config_file, restart):
+def get_cache_server(config, restart, replay):
+    if replay:
+        # Crawl a recorded corpus through a local cache server, offline.
+        from utils.cache_server import StandInCacheServer, load_corpus
+        server = StandInCacheServer(corpus=load_corpus(replay)).start()
+        return server.address
+    from utils.server_registration import get_cache_server
+    return get_cache_server(config, restart)
+
+
+def main(config_file, restart, replay=None, coordinator=False, node_id=None,
+         local=False, reparse=False):
     print("In main")
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
+    if reparse:
+        # Re-crawl from the seeds through the response cache only; pages that
+        # were never cached are skipped, nothing goes to the network.
+        assert config.response_cache, "Set RESPONSECACHE in config.ini to re-parse"
+        config.cache_only = True
+        config.time_delay = 0
+        # Its own frontier and analytics, so the real crawl's are kept.
+        config.save_file = f"{config.save_file}.reparse"
+        crawler = Crawler(config, True)
+        crawler.start()
+        return
+    if config.nodes > 1 and node_id is not None:
+        # One node of a distributed crawl; the coordinator has the cache server.
+        from crawler.distributed import DistributedFrontier, connect, node_config
+        node_config(config, node_id)
+        connection, config.cache_server = connect(config)
+        crawler = Crawler(
+            config, restart,
+            frontier_factory=partial(DistributedFrontier, connection=connection))
+        crawler.start()
+        return
+    config.cache_server = get_cache_server(config, restart, replay)
+    if config.nodes > 1 and (coordinator or local):
+        from crawler.distributed import Coordinator
+        hub = Coordinator(config, config.cache_server)
+        nodes = list()
+        if local:
+            # Every node as a process on this machine.
+            args = [sys.executable, sys.argv[0], "--config_file", config_file]
+            args += ["--restart"] if restart else []
+            nodes = [
+                subprocess.Popen(args + ["--node_id", str(node)])
+                for node in range(config.nodes)]
+        hub.serve()
+        for node in nodes:
+            node.wait()
+        return
     crawler = Crawler(config, restart)
     crawler.start()
 
@@ -21,5 +71,11 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--replay", type=str, default=None)
+    parser.add_argument("--coordinator", action="store_true", default=False)
+    parser.add_argument("--node_id", type=int, default=None)
+    parser.add_argument("--local", action="store_true", default=False)
+    parser.add_argument("--reparse", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.replay, args.coordinator,
+         args.node_id, args.local, args.reparse)
@@ -1,76 +1,122 @@
 import utils.config as config
-import re
+import logging
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 from collections import Counter
-import nltk
-from nltk.corpus import stopwords
 import time
-from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-
-nltk.download('stopwords')
+from array import array
+from threading import Lock
+from urllib.parse import urlparse, urlunparse
+from utils import get_logger
+from utils.events import EventLog
+from utils.links import LinkExtractor
+from utils.metrics import metrics
+from utils.page_analysis import analyze_page
+from utils.prefilter import ResponsePrefilter
+from utils.seen import make_seen_set, digest
+from utils.simhash import NearDuplicateIndex, checksum, simhash
+from utils.stats_checkpoint import StatsCheckpoint
+from utils.stopwords import STOP_WORDS
+from utils.url_filter import UrlFilter, HEURISTIC, CALENDAR
+from utils.word_stats import WordStats, count_words
 
 #NOTE: You need to be connected to UCI vpn
 
 # GLOBALS:
-word_counter = Counter()
-seen_urls = {} # (URL, time accessed)
+word_stats = WordStats() # word frequencies, see configure() for top-k mode
+seen_urls = make_seen_set() # digests of normalized URLs already scraped
 longest_page_pair = ("", 0)  # (URL, word count)
 subdomain_counts = {}  # (subdomain, unique page count)
 most_common_words = [] # stores 50 most common words
+near_duplicates = NearDuplicateIndex() # fingerprints of page content already scraped
+stats_lock = Lock() # guards the globals above when pages are merged concurrently
+stats_checkpoint = None # persists the globals above next to the frontier save file
 
 # GLOBAL CONST REFERENCES:
 MAX_CAL_PAGES = 0
-TRAP_TIME_THRESHOLD = 60 #1 minute
 MAX_TEXT_LEN_THRESHOLD = (5 * 1024 * 1024) * 3 #3MB to be safe since only crawling text content
 MIN_TEXT_RATIO_THRESHOLD = 0.015
-stop_words = set(stopwords.words('english'))
-
-# Takes page to be crawled, determines if status 200 page has no textual content
-def is_dead_url(content):
-    soup = BeautifulSoup(content, "html.parser")
-    text = soup.get_text().strip()
-
-    return len(text) == 0
+stop_words = STOP_WORDS # bundled, no NLTK download at import
+url_filter = UrlFilter()
+# resolves and dedups page links, caching check_link per url
+link_extractor = LinkExtractor(lambda url: check_link(url))
+prefilter = ResponsePrefilter(MAX_TEXT_LEN_THRESHOLD)
+logger = get_logger("SCRAPER")
+# skipped links and pages are counted per category, not printed one by one
+events = EventLog(logger)
+
+# Called once at startup with the crawler's Config to pick the stat backends,
+# and to reload the analytics checkpointed by an earlier run unless restarting
+def configure(crawler_config, restart=False):
+    global word_stats, seen_urls, near_duplicates, stats_checkpoint
+    word_stats = WordStats(crawler_config.word_stats_top_k)
+    seen_urls = make_seen_set(crawler_config.seen_set, crawler_config.bloom_capacity)
+    near_duplicates = NearDuplicateIndex(
+        crawler_config.duplicate_capacity, crawler_config.duplicate_distance)
+    metrics.gauge("scraper.seen_urls", lambda: len(seen_urls))
+    metrics.gauge("scraper.seen_urls_bytes", lambda: seen_urls.memory_bytes())
+    metrics.gauge("scraper.distinct_words", lambda: len(word_stats))
+    metrics.gauge("scraper.events", events.summary)
+    stats_checkpoint = StatsCheckpoint(
+        f"{crawler_config.save_file}.stats", get_stats_state,
+        crawler_config.stats_batch, crawler_config.save_interval)
+    if restart:
+        stats_checkpoint.remove()
+    else:
+        state = stats_checkpoint.load()
+        if state is not None:
+            restore_stats_state(state)
+
+def get_stats_state():
+    # full analytics state, as written by the checkpoint
+    return {
+        "seen": array("Q", seen_urls.digests()),
+        "words": word_stats.snapshot(),
+        "subdomains": dict(subdomain_counts),
+        "longest": longest_page_pair,
+    }
+
+def restore_stats_state(state):
+    # adds to the current globals, so it also merges the states of several
+    # crawler nodes
+    global longest_page_pair
+    for value in state["seen"]:
+        seen_urls.add_digest(value)
+    if state.get("words"):
+        word_stats.merge(state["words"])
+    for word_counts in state.get("word_deltas", []):
+        word_stats.update(word_counts)
+    for subdomain, count in state["subdomains"].items():
+        subdomain_counts[subdomain] = subdomain_counts.get(subdomain, 0) + count
+    if state["longest"][1] > longest_page_pair[1]:
+        longest_page_pair = tuple(state["longest"])
+
+# Called once the crawl stops so the last pages are checkpointed
+def save_stats():
+    if stats_checkpoint is not None:
+        with stats_lock:
+            stats_checkpoint.close()
+
+# Takes analyzed page, determines if status 200 page has no textual content
+def is_dead_url(page):
+    return page.is_dead
 
 # Takes page to be crawled and does prelim check
 # Should not parse if page is too large or contributes low information gain
-def should_parse(url, resp):
-    global MIN_TEXT_RATIO_THRESHOLD, MAX_TEXT_LEN_THRESHOLD
+# Size and Content-Type are checked earlier by prefilter, before parsing
+def should_parse(url, resp, page):
+    global MIN_TEXT_RATIO_THRESHOLD
 
-    # try to get size from header if present
     try:
-        if hasattr(resp, 'headers'):
-            content_length = resp.headers.get('Content-Length')
-
-            if content_length is not None:
-                content_length = int(content_length)
-            if content_length > MAX_TEXT_LEN_THRESHOLD:
-                print(f"Skipping {url} - Content too large: {content_length} bytes")
-            return False
-
-            excluded_media_types = [
-                'application/pdf', 'image/', 'video/', 'audio/'
-            ]
-            if any(media_type in content_type for media_type in excluded_media_types):
-                print(f"Skipping {url} - Excluded Content-Type: {content_type}")
-                return False
-
-        # grab text content
-        soup = BeautifulSoup(resp.raw_response.content, "html.parser")
-        text_content = soup.get_text(separator=" ").strip()
-        word_count = len(text_content.split())
-
-        # calc text to content ratio (text vs markup + text)
-        content_size = len(resp.raw_response.content)
-        text_ratio = len(text_content) / content_size if content_size > 0 else 0
+        # text to content ratio (text vs markup + text) comes from the single parse
+        text_ratio = page.text_ratio
 
         # low ratio --> low information gain
         if text_ratio < MIN_TEXT_RATIO_THRESHOLD:
-            print(f"Skipping {url} - Low text_ratio {text_ratio}")
+            events.record("low_text_ratio", "Skipping %s - Low text_ratio %s", url, text_ratio)
             return False
     except Exception as e:
-        print(f"Exception occurred while processing {url}: {e}")
+        events.record("error", "Exception occurred while processing %s: %s", url, e,
+                      level=logging.ERROR)
         return False
 
     return True
@@ -84,114 +130,195 @@ def should_parse(url, resp):
 #  4. list of subdomains ordered alphabetically + # of unique pages detected in each subdomain (displayed: subdomain, number)
 
 def normalize_url(parsed_url):
-    # List of query parameters to exclude
-    excluded_params = [
-        'sessionId',
-        'PHPSESSID',
-        'JSESSIONID',
-        'utm_source',
-        'utm_medium',
-        'utm_campaign',
-        'utm_term',
-        'utm_content',
-        'gclid',
-        'fbclid',
-        'ref',
-        'tracking_id',
-        'referrer',
-        'source',
-        'entry',
-        'index',
-        'view',
-        'sort',
-        'filter',
-        'format',
-        't',
-        'token',
-        'lang',
-        'locale',
-        'calendar',
-        'eventDate',
-        'eventDisplay',
-        'post_type',
-        'outlook-ical',
-        'ical',
-        'comment'
-    ]
-
-    query_params = parse_qs(parsed_url.query)
-    for param in excluded_params:
-        query_params.pop(param, None)
-
-    # rebuild query w/o params
-    normalized_query = urlencode(query_params, doseq=True)
-    normalized_url = urlunparse(parsed_url._replace(query=normalized_query))
-
-    return normalized_url
-
-
-def scraper(url, resp):
-    global longest_page_pair, word_counter, seen_urls
-
+    # Drop query parameters that don't change the content (see utils.url_filter)
+    return url_filter.normalize(parsed_url)
+
+
+class PageResult(object):
+    # Everything a parsed page contributes, built without touching the globals
+    # so it can be computed in a parser process and merged in the main one.
+    def __init__(self, url, defragmented_url, normalized_url, links,
+                 num_tokens, word_counts, subdomain, checksum, fingerprint,
+                 duplicate=None, raw_size=0, parse_seconds=0.0):
+        self.url = url
+        self.defragmented_url = defragmented_url
+        self.normalized_url = normalized_url
+        self.links = links
+        self.num_tokens = num_tokens
+        self.word_counts = word_counts
+        self.subdomain = subdomain
+        # content fingerprints; duplicate is None until checked against
+        # near_duplicates, then False or the kind of duplicate found
+        self.checksum = checksum
+        self.fingerprint = fingerprint
+        self.duplicate = duplicate
+        # set by merge_page_result: a new url whose content is not a copy
+        self.new_content = False
+        # what decoding and parsing this page cost, for prefilter's estimate
+        self.raw_size = raw_size
+        self.parse_seconds = parse_seconds
+
+
+def get_normalized_url(url):
+    # returns (defragmented url, normalized url)
+    defragmented_url = urlunparse(urlparse(url)._replace(fragment=''))
+    return defragmented_url, normalize_url(urlparse(defragmented_url))
+
+
+def process_page(url, resp, duplicate_index=None):
+    # Parse and tokenize one downloaded page. Pure with respect to the crawl
+    # statistics; returns a PageResult, or None if the page is not parsed.
+    # With a duplicate_index (thread mode) duplicate content is caught before
+    # link extraction; otherwise merge_page_result checks it.
     try:
+        # status, size and a byte prefix, before the response is unpickled
+        reason = prefilter.check(url, resp)
+        if reason is None:
+            started = time.thread_time()
+            # headers, after unpickling but before any html parsing
+            reason = prefilter.check_headers(url, resp)
+        if reason is not None:
+            events.record(f"prefilter_{reason}", "Note %s was not parsed (%s)", url, reason)
+            return None
+
+        # parse the page once, every check below reads from this analysis;
+        # the body is decoded once, with the charset of its headers or <meta>
+        page = analyze_page(resp.raw_response.text)
+
         # initially decide if we parse
-        if (resp.status != 200
-                or is_dead_url(resp.raw_response.content)
-                or not should_parse(url, resp)
+        if (is_dead_url(page)
+                or not should_parse(url, resp, page)
                 or is_calendar_page(url)
         ):
-            print(f"\tNote {url} was not parsed")
-            return []
+            events.record("not_parsed", "Note %s was not parsed", url)
+            return None
+
+        defragmented_url, normalized_url = get_normalized_url(url)
+        subdomain = urlparse(url).netloc.split('.')[0]  # extract subdomain
+
+        # count unique words excluding stop words, in one regex pass
+        word_counts = count_words(page.text, stop_words)
+
+        # fingerprint the content so copies under other urls aren't expanded
+        page_checksum = checksum(page.tokens)
+        fingerprint = simhash(word_counts)
+        parse_seconds = time.thread_time() - started
+        if duplicate_index is not None:
+            duplicate = duplicate_index.check_and_add(page_checksum, fingerprint)
+            if duplicate:
+                events.record("duplicate", "Skipping %s - %s duplicate content", url, duplicate)
+                return PageResult(
+                    url, defragmented_url, normalized_url, [],
+                    len(page.tokens), Counter(), subdomain,
+                    page_checksum, fingerprint, duplicate, resp.raw_size,
+                    parse_seconds)
 
+        # extract next urls and make sure they're not traps
+        valid_links = extract_next_links(url, resp, page)
+
+        return PageResult(
+            url, defragmented_url, normalized_url, valid_links,
+            len(page.tokens), word_counts, subdomain, page_checksum,
+            fingerprint, False if duplicate_index is not None else None,
+            resp.raw_size, parse_seconds)
+    except Exception as e:
+        events.record("error", "Error while processing URL %s: %s", url, e,
+                      level=logging.ERROR)
+        return None
+
+
+def process_page_counted(url, resp):
+    # process_page for a parser process: also returns the skip, prefilter and
+    # link-cache counts it added here, which only the parent reports (see
+    # merge_counts)
+    return process_page(url, resp), take_counts()
+
+
+def take_counts():
+    # this process's counters since the last call, reset
+    return (events.take_counts(), prefilter.take_counts(),
+            link_extractor.take_counts())
+
+
+def merge_counts(counts):
+    event_counts, prefilter_counts, link_counts = counts
+    events.add_counts(event_counts)
+    prefilter.add_counts(prefilter_counts)
+    link_extractor.add_counts(link_counts)
+
+
+def merge_page_result(result, recheck_links=True):
+    # Fold one PageResult into the crawl statistics; returns its new links.
+    global longest_page_pair
+
+    prefilter.record_parsed(result.raw_size, result.parse_seconds)
+
+    with stats_lock:
         # skip if url has already been seen, otherwise add to set of seen urls
-        parsed_url = urlparse(url)
-        defragmented_url = urlunparse(parsed_url._replace(fragment=''))
-        parsed_defragmented_url = urlparse(defragmented_url)
-        normalized_url = normalize_url(parsed_defragmented_url)
-
-        if normalized_url in seen_urls:
-            last_seen = seen_urls[normalized_url]
-            if time.time() - last_seen < TRAP_TIME_THRESHOLD:
-                print(f"Potential infinite trap detected at normalized url {normalized_url} \n\t formerly {url} - Accessed too recently")
-            else:
-                print(f"Already seen {normalized_url} - Skipping")
+        if not seen_urls.add(result.normalized_url):
+            events.record("already_seen", "Already seen %s - Skipping", result.normalized_url)
             return []
-        seen_urls[normalized_url] = time.time() # update dict
 
-        # extract next urls and make sure they're not traps
-        valid_links = extract_next_links(url, resp)
-
-        # extract words (text) from page
-        content = resp.raw_response.content.decode('utf-8')
-        soup = BeautifulSoup(content, 'html.parser')
-        text = soup.get_text(separator=' ')
-        tokens = text.split()
-        num_tokens = len(tokens)
-
-        # update longest page pair
-        if num_tokens > longest_page_pair[1]:
-            longest_page_pair = (defragmented_url, num_tokens)
-
-        # count unique words excluding stop words
-        filtered_tokens = [
-            word.lower() for word in tokens
-            if word.lower() not in stop_words and len(word) > 1 and re.search(r"[a-zA-Z0-9]{2,}", word)
-        ]
-        word_counter.update(filtered_tokens)
-
-        # update subdomain info
-        subdomain = parsed_url.netloc.split('.')[0]  # extract subdomain
-        if subdomain in subdomain_counts:
-            subdomain_counts[subdomain] += 1
-        else:
-            subdomain_counts[subdomain] = 1
-
-        return valid_links
-    except Exception as e:
-        print(f"Error while processing URL {url}: {e}")
-        return []
+        if result.duplicate is None:
+            result.duplicate = near_duplicates.check_and_add(
+                result.checksum, result.fingerprint) or False
+            if result.duplicate:
+                events.record("duplicate", "Skipping %s - %s duplicate content",
+                              result.url, result.duplicate)
+                result.links = []
+                result.word_counts = Counter()
+
+        # update subdomain info, a duplicate still is a unique page (url)
+        subdomain_counts[result.subdomain] = subdomain_counts.get(result.subdomain, 0) + 1
+
+        # update longest page pair and words, unless the content is a copy
+        page_pair = ("", 0)
+        if not result.duplicate:
+            result.new_content = True
+            page_pair = (result.defragmented_url, result.num_tokens)
+            if result.num_tokens > longest_page_pair[1]:
+                longest_page_pair = page_pair
+            word_stats.update(result.word_counts)
+
+        # last, so a compaction triggered here includes this page
+        if stats_checkpoint is not None:
+            stats_checkpoint.record(
+                digest(result.normalized_url), result.word_counts,
+                result.subdomain, page_pair)
+
+        if result.duplicate:
+            return []
+
+    # links parsed in another process were validated against a stale
+    # seen_urls, so re-check them against pages scraped since then
+    if not recheck_links:
+        return result.links
+    return [link for link in result.links if not is_seen_url(link)]
+
 
-def extract_next_links(url, resp):
+def scraper(url, resp):
+    return scrape_page(url, resp)[0]
+
+# Same as scraper, plus whether the page added new content to the crawl
+# (a new url, not a duplicate), which the frontier counts as its yield
+def scrape_page(url, resp):
+    with metrics.timer("scraper.scraper"):
+        return _scraper(url, resp)
+
+def _scraper(url, resp):
+    # skip early if url has already been seen, before paying for the parse
+    normalized_url = get_normalized_url(url)[1]
+    if resp.status == 200 and normalized_url in seen_urls:
+        events.record("already_seen", "Already seen %s - Skipping", normalized_url)
+        return [], False
+
+    result = process_page(url, resp, near_duplicates)
+    if result is None:
+        return [], False
+    links = merge_page_result(result, recheck_links=False)
+    return links, result.new_content
+
+def extract_next_links(url, resp, page):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -200,123 +327,96 @@ def extract_next_links(url, resp):
     # resp.raw_response: this is where the page actually is. More specifically, the raw_response has two parts:
     #         resp.raw_response.url: the url, again
     #         resp.raw_response.content: the content of the page!
+    # page: the PageAnalysis of resp.raw_response.content
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
-    soup = BeautifulSoup(resp.raw_response.content, "html.parser")
     links = []
 
-    # get links from a tags
-    for a_tag in soup.find_all('a', href=True):
-        link = a_tag['href']
-        if is_valid(link):
+    # links from a tags, then redirects from 'meta' tags with 'http-equiv'
+    # set to 'refresh', resolved against the page's final url; each distinct
+    # link is checked once, and the static checks are cached across pages
+    base_url = getattr(resp.raw_response, "url", None) or resp.url or url
+    for link, normalized_url in link_extractor.extract(
+            base_url, page.links + page.refresh_urls):
+        # make sure we aren't scraping same page twice
+        if not is_seen_url(link, normalized_url):
             links.append(link)
 
-    # get redirects from 'meta' tags with 'http-equiv' set to 'refresh'
-    for meta_tag in soup.find_all('meta', {'http-equiv': 'refresh'}, content=True):
-        content = meta_tag['content']
-        if 'url=' in content.lower():
-            redirect_url = content.split('url=')[-1].strip()
-            if is_valid(redirect_url):
-                links.append(redirect_url)
-
     return links
 
 def is_calendar_page(url):
-    parsed = urlparse(url)
-
-    calendar_patterns = [
-        r"(?:/day/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # /day/yyyy-mm-dd or /day/mm-dd-yyyy
-        r"(?:/month/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))",  # /month/yyyy-mm or /month/mm-yyyy
-        r"(?:/events/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # /events/yyyy-mm-dd or /events/mm-dd-yyyy
-        r"(?:=(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # =yyyy-mm-dd or =mm-dd-yyyy ( means date is passed as query param)
-        r"(?:/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))", # /yyyy-mm or /mm-yyyy might need to stop this
-        r"(?<=\?|&)ical=[^&]*", #ical=...
-        r"(?<=\?|&)outlook-ical=[^&]*" #outlook-ical=...
-    ]
-
-    combined_pattern = '|'.join(calendar_patterns)
-    if re.search(combined_pattern, parsed.path) or re.search(combined_pattern, parsed.query):
-        return True
-
-    return False
+    return url_filter.is_calendar_page(urlparse(url))
 
 def is_valid(url):
 
     # Decide whether to crawl this url or not.
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-
-    valid_domains = [
-        ".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu",
-        ".stat.uci.edu", "today.uci.edu/department/information_computer_sciences"
-    ]
+    # The static rules (scheme, domain, heuristics, calendar traps and file
+    # extensions) live in url_filter, which is built once at import.
 
     try:
-        parsed = urlparse(url)
-
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        domain_allowed = any(parsed.netloc.endswith(domain) for domain in valid_domains)
-        path_allowed = "today.uci.edu/department/information_computer_sciences" in parsed.netloc + parsed.path
-        if not (domain_allowed or path_allowed):
-            return False
-
-        # common signs of invalid/low info gain content
-        path = parsed.path.lower()
-        query = parsed.query.lower()
-        if (re.search(r"/(?:uploads|files)(?:/|$)", path)
-                or "login" in path
-                or "action=download" in query
-                or "action=login" in query
-                or "share=" in query
-        ):
-            print(f"Skipping {url} due to heuristic match for non-text/invalid content")
-            return False
-
-        # check again for calendar trap
-        if is_calendar_page(url):
-            print(f"Skipping {url} due to calendar trap")
-            return False
-
-        # invalid file extension
-        if re.match(
-            r".*(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", path):
+        normalized_url = check_link(url)
+        if normalized_url is None:
             return False
 
         # make sure we aren't scraping same page twice
-        defragmented_url = urlunparse(parsed._replace(fragment=''))
-        parsed_defragmented_url = urlparse(defragmented_url)
-        normalized_url = normalize_url(parsed_defragmented_url)
-        if normalized_url in seen_urls:
-            seen_urls[normalized_url]
-            print(f"Skipping - Already seen normalized url {normalized_url} from {url}")
+        if is_seen_url(url, normalized_url):
             return False
 
         return True
     except TypeError:
-        print("TypeError for ", parsed)
+        logger.error(f"TypeError for {url}")
         raise
 
-# Called post crawl to output info collected
-def get_summary_info():
+def check_link(url):
+    # The static part of is_valid: the normalized url if url_filter accepts
+    # url, else None. Independent of the crawl so far, so link_extractor
+    # caches it per url.
+    parsed = urlparse(url)
+
+    reason = url_filter.reject_reason(parsed)
+    if reason == HEURISTIC:
+        events.record("heuristic", "Skipping %s due to heuristic match for non-text/invalid content", url)
+        return None
+    if reason == CALENDAR:
+        events.record("calendar", "Skipping %s due to calendar trap", url)
+        return None
+    if reason is not None:
+        return None
+
+    return get_normalized_url(url)[1]
+
+def is_seen_url(url, normalized_url=None):
+    if normalized_url is None:
+        normalized_url = get_normalized_url(url)[1]
+    if normalized_url in seen_urls:
+        events.record("seen_link", "Skipping - Already seen normalized url %s from %s",
+                      normalized_url, url)
+        return True
+    return False
+
+# Called post crawl to output info collected; crawl_details=False leaves out
+# the counters that only this process has (e.g. for merged node analytics)
+def get_summary_info(crawl_details=True):
     # longest page URL and word count
     url_longest_page, longest_word_count = longest_page_pair
 
     # most common words
-    most_common_words = word_counter.most_common(50)
+    most_common_words = word_stats.most_common(50)
 
     # sorted subdomain info alphabetically
     subdomain_info = sorted(subdomain_counts.items())
 
     # print summary information
     print("Unique pages count:", len(seen_urls))
+    if crawl_details:
+        print("Seen-set memory (bytes):", seen_urls.memory_bytes())
+        print("Response prefilter:", prefilter.summary())
+        print(f"Link checks cached: {link_extractor.hit_rate():.1%} of "
+              f"{link_extractor.hits + link_extractor.misses} links")
+        print("Skipped (by reason):", events.summary())
+        print(f"Duplicate content skipped: {near_duplicates.exact_hits} exact, "
+              f"{near_duplicates.near_hits} near "
+              f"({near_duplicates.hit_rate():.1%} of {near_duplicates.lookups} pages)")
     print("Longest page's URL:", url_longest_page)
     print("Longest page word count:", longest_word_count)
     print("Most common words:")
@@ -1,24 +1,124 @@
 import os
+import atexit
 import logging
 from hashlib import sha256
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
 from urllib.parse import urlparse
 
-def get_logger(name, filename=None):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
+# Every logger puts its records on one queue; a single listener thread
+# formats them and does the file and console writes, so logging never
+# blocks a worker on I/O. Parser processes put theirs on a multiprocessing
+# queue that the parent forwards to this one (see forward_child_logs).
+_log_queue = SimpleQueue()
+_log_listener = None
+_log_files = dict()
+_log_lock = Lock()
+
+
+def _log_file_handler(log_file):
+    # Called with _log_lock held.
+    handler = _log_files.get(log_file)
+    if handler is None:
+        handler = logging.FileHandler(log_file)
+        handler.setLevel(logging.DEBUG)
+        handler.setFormatter(logging.Formatter(
+           "%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        _log_files[log_file] = handler
+    return handler
+
+
+class _LogFileRouter(logging.Handler):
+    # Listener side: writes each record to the file of the logger that made it.
+    # A logger first made in a child process has no file here yet.
+    def emit(self, record):
+        handler = _log_files.get(record.log_file)
+        if handler is None:
+            with _log_lock:
+                handler = _log_file_handler(record.log_file)
+        handler.handle(record)
+
+
+class _LogFileTag(logging.Filter):
+    def __init__(self, log_file):
+        super().__init__()
+        self.log_file = log_file
+
+    def filter(self, record):
+        record.log_file = self.log_file
+        return True
+
+
+class _LogForwarder(logging.Handler):
+    # Parent side: hands records from child processes to the log listener.
+    def emit(self, record):
+        _log_queue.put_nowait(record)
+
+
+def _start_log_listener():
+    global _log_listener
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    ch.setFormatter(logging.Formatter(
+       "%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    _log_listener = QueueListener(
+        _log_queue, _LogFileRouter(), ch, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # Write out everything still queued. Registered to run at exit.
+    global _log_listener
+    with _log_lock:
+        if _log_listener:
+            _log_listener.stop()
+            _log_listener = None
+
+
+def forward_child_logs(context):
+    # A queue of the multiprocessing context for child processes to log to
+    # (see log_to_queue), and the started listener forwarding its records.
+    queue = context.Queue()
+    listener = QueueListener(queue, _LogForwarder())
+    listener.start()
+    return queue, listener
+
+
+def log_to_queue(queue):
+    # Process pool initializer: send this process's log records to queue.
+    # A forked child inherits loggers pointing at the parent's in-memory
+    # queue, which nothing in the child reads.
+    global _log_queue, _log_listener
+    with _log_lock:
+        _log_queue = queue
+        # the parent writes the files; never start a listener here
+        _log_listener = False
+        for logger in logging.Logger.manager.loggerDict.values():
+            for handler in getattr(logger, "handlers", ()):
+                if isinstance(handler, QueueHandler):
+                    handler.queue = queue
+
+
+def get_logger(name, filename=None):
+    # Safe to call repeatedly: handlers are only attached the first time.
+    logger = logging.getLogger(name)
+    with _log_lock:
+        if logger.handlers:
+            return logger
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not os.path.exists("Logs"):
+            os.makedirs("Logs")
+        log_file = f"Logs/{filename if filename else name}.log"
+        if _log_listener is not False:
+            _log_file_handler(log_file)
+        qh = QueueHandler(_log_queue)
+        qh.addFilter(_LogFileTag(log_file))
+        logger.addHandler(qh)
+        if _log_listener is None:
+            _start_log_listener()
     return logger
 
 
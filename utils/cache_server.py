@@ -0,0 +1,177 @@
+import os
+import cbor
+import pickle
+import struct
+import time
+import requests
+
+from collections import deque
+from hashlib import sha512
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import urlparse, parse_qs
+
+
+def make_payload(url, status, content, headers=None):
+    # Encode a page the way the spacetime cache server does: a cbor dict
+    # whose "response" is a pickled requests.Response.
+    raw = requests.Response()
+    raw.url = url
+    raw.status_code = status
+    raw._content = content
+    raw.headers.update(headers or {"Content-Type": "text/html; charset=utf-8"})
+    raw.encoding = "utf-8"
+    return cbor.dumps({"url": url, "status": status, "response": pickle.dumps(raw)})
+
+
+def synthetic_page(url, links_per_page=20, words_per_page=400, keep=None):
+    # Deterministic fake ICS page: the same url always yields the same links,
+    # so crawls and benchmarks against it are repeatable. With keep, only
+    # links to urls in keep are left on the page.
+    seed = sha512(url.encode("utf-8")).digest()
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu",
+             "www.stat.uci.edu"]
+    links = [
+        f"https://{hosts[seed[i] % len(hosts)]}/page/{seed[i]}/{seed[i + 1]}"
+        for i in range(0, 2 * links_per_page, 2) if i + 1 < len(seed)]
+    if keep is not None:
+        links = [link for link in links if link in keep]
+    words = " ".join(
+        f"word{seed[i % len(seed)] ^ (i & 0xFF)}" for i in range(words_per_page))
+    body = "".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+    return (f"<html><head><title>{url}</title></head><body><p>{words}</p>"
+            f"<ul>{body}</ul></body></html>").encode("utf-8")
+
+
+def synthetic_corpus(seed_urls, page_count, **page_options):
+    # The first page_count pages reachable from seed_urls on the synthetic
+    # site, breadth first, as url -> payload. Their links to pages past them
+    # are dropped, so a replayed crawl fetches exactly the corpus, in
+    # whatever order, and ends.
+    urls = dict()
+    queue = deque(seed_urls)
+    while queue and len(urls) < page_count:
+        url = queue.popleft()
+        if url in urls:
+            continue
+        urls[url] = None
+        queue.extend(synthetic_links(synthetic_page(url, **page_options)))
+    return {
+        url: make_payload(url, 200, synthetic_page(url, keep=urls, **page_options))
+        for url in urls}
+
+
+def synthetic_links(content):
+    return [
+        part.split('"', 1)[0]
+        for part in content.decode("utf-8").split('href="')[1:]]
+
+
+# Corpus file: one record per response, a 4-byte big-endian length followed
+# by cbor {"url": url, "payload": <cache server response body>}.
+_RECORD_LENGTH = struct.Struct(">I")
+
+
+class CorpusRecorder(object):
+    ''' Appends the cache server responses seen by download() to a corpus
+    file that load_corpus() and StandInCacheServer can replay. Thread safe. '''
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.file = open(path, "ab")
+        self.lock = Lock()
+        self.recorded = 0
+
+    def record(self, url, payload):
+        record = cbor.dumps({"url": url, "payload": payload})
+        with self.lock:
+            self.file.write(_RECORD_LENGTH.pack(len(record)) + record)
+            self.file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def load_corpus(path):
+    # url -> payload from a recorded corpus. A record cut off by a crash
+    # ends the corpus; the last response of a url wins.
+    corpus = dict()
+    with open(path, "rb") as corpus_file:
+        data = corpus_file.read()
+    offset = 0
+    while offset + _RECORD_LENGTH.size <= len(data):
+        (length,) = _RECORD_LENGTH.unpack_from(data, offset)
+        offset += _RECORD_LENGTH.size
+        if offset + length > len(data):
+            break
+        record = cbor.loads(data[offset:offset + length])
+        corpus[record["url"]] = record["payload"]
+        offset += length
+    return corpus
+
+
+class StandInCacheServer(object):
+    ''' Local stand-in for the spacetime cache server.
+
+    Speaks the same protocol as the real one (GET /?q=<url>&u=<agent>,
+    cbor-encoded response), so utils.download works against it unchanged.
+    pages(url) returns (status, content) and defaults to synthetic_page.
+    With a corpus (url -> recorded payload, see load_corpus) the recorded
+    responses are replayed byte for byte and other urls get a 404. latency
+    adds a fixed delay per request to mimic the network. '''
+    def __init__(self, pages=None, host="127.0.0.1", port=0, latency=0.0,
+                 corpus=None):
+        self.pages = pages or (lambda url: (200, synthetic_page(url)))
+        self.corpus = corpus
+        self.latency = latency
+        self.requests_served = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this a
+            # keep-alive client waits on Nagle + delayed ACK every request.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                if server.latency:
+                    time.sleep(server.latency)
+                payload = server.payload(url)
+                server.requests_served += 1
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def payload(self, url):
+        if self.corpus is not None:
+            payload = self.corpus.get(url)
+            return payload if payload is not None else make_payload(url, 404, b"")
+        status, content = self.pages(url)
+        return make_payload(url, status, content)
+
+    @property
+    def address(self):
+        # Drop-in value for config.cache_server.
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
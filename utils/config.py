@@ -8,11 +8,45 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.download_concurrency = int(config["LOCAL PROPERTIES"].get("DOWNLOADCONCURRENCY", 8))
+        self.parse_mode = config["LOCAL PROPERTIES"].get("PARSEMODE", "thread").strip()
+        assert self.parse_mode in ("thread", "process"), "PARSEMODE should be 'thread' or 'process'"
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", 0))
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.save_batch = int(config["LOCAL PROPERTIES"].get("SAVEBATCH", 100))
+        self.save_interval = float(config["LOCAL PROPERTIES"].get("SAVEINTERVAL", 5))
+        self.seen_set = config["LOCAL PROPERTIES"].get("SEENSET", "hash")
+        self.bloom_capacity = int(config["LOCAL PROPERTIES"].get("BLOOMCAPACITY", 0))
+        self.stats_batch = int(config["LOCAL PROPERTIES"].get("STATSBATCH", 50))
+        self.duplicate_capacity = int(config["LOCAL PROPERTIES"].get("DUPLICATECAPACITY", 100000))
+        self.duplicate_distance = int(config["LOCAL PROPERTIES"].get("DUPLICATEDISTANCE", 3))
+        self.word_stats_top_k = int(config["LOCAL PROPERTIES"].get("WORDSTATSTOPK", 0))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
+        self.frontier_memory = int(config["LOCAL PROPERTIES"].get("FRONTIERMEMORY", 100000))
+        self.trap_window = int(config["LOCAL PROPERTIES"].get("TRAPWINDOW", 50))
+        self.trap_min_yield = float(config["LOCAL PROPERTIES"].get("TRAPMINYIELD", 0.02))
+        self.trap_template_budget = int(config["LOCAL PROPERTIES"].get("TRAPTEMPLATEBUDGET", 0))
+        self.robots_ttl = float(config["LOCAL PROPERTIES"].get("ROBOTSTTL", 86400))
+        self.sitemap_max_urls = int(config["LOCAL PROPERTIES"].get("SITEMAPMAXURLS", 50000))
+        self.response_cache = config["LOCAL PROPERTIES"].get("RESPONSECACHE", "").strip()
+        self.response_cache_bytes = int(config["LOCAL PROPERTIES"].get("RESPONSECACHEBYTES", 2 * 2 ** 30))
+        self.response_cache_ttl = float(config["LOCAL PROPERTIES"].get("RESPONSECACHETTL", 0))
+        self.cache_only = False
+        self.record_file = config["LOCAL PROPERTIES"].get("RECORDFILE", "").strip()
+
+        self.metrics_file = config["LOCAL PROPERTIES"].get("METRICSFILE", "Logs/metrics.json").strip()
+        self.metrics_interval = float(config["LOCAL PROPERTIES"].get("METRICSINTERVAL", 10))
+        self.metrics_port = int(config["LOCAL PROPERTIES"].get("METRICSPORT", 0))
+
+        self.nodes = int(config["LOCAL PROPERTIES"].get("NODES", 1))
+        self.node_id = 0
+        self.coordinator = config["LOCAL PROPERTIES"].get("COORDINATOR", "127.0.0.1:9100").strip()
+        self.forward_batch = int(config["LOCAL PROPERTIES"].get("FORWARDBATCH", 100))
+        self.forward_interval = float(config["LOCAL PROPERTIES"].get("FORWARDINTERVAL", 1))
+
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
 
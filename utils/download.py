@@ -2,16 +2,97 @@ import requests
 import cbor
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+from threading import local, BoundedSemaphore, Lock
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import metrics
 from utils.response import Response
+from utils.response_cache import (
+    ResponseCache, CACHE_MISS_STATUS, CACHEABLE_STATUSES)
+
+# One pooled Session per thread keeps the connection to the cache server
+# alive between downloads; the semaphore caps requests in flight overall,
+# one per configured concurrency so a process can run several settings.
+_sessions = local()
+_in_flight = {}
+_in_flight_lock = Lock()
+_recorder = None
+_cache = None
+
+
+def _get_session(config):
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=config.download_concurrency)
+        session.mount("http://", adapter)
+        _sessions.session = session
+    return session
+
+
+def _get_limit(config):
+    limit = _in_flight.get(config.download_concurrency)
+    if limit is None:
+        with _in_flight_lock:
+            limit = _in_flight.setdefault(
+                config.download_concurrency,
+                BoundedSemaphore(config.download_concurrency))
+    return limit
+
+
+def _get_recorder(config):
+    global _recorder
+    if _recorder is None and config.record_file:
+        with _in_flight_lock:
+            if _recorder is None:
+                # Only recording crawls need the cache server tooling.
+                from utils.cache_server import CorpusRecorder
+                _recorder = CorpusRecorder(config.record_file)
+    return _recorder
+
+
+def _get_cache(config):
+    global _cache
+    if _cache is None and config.response_cache:
+        with _in_flight_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    config.response_cache, config.response_cache_bytes,
+                    config.response_cache_ttl)
+    return _cache
+
 
 def download(url, config, logger=None):
+    cache = _get_cache(config)
+    if cache is not None:
+        payload = cache.get(url, allow_stale=config.cache_only)
+        if payload is not None:
+            metrics.increment("download.cache_hits")
+            with metrics.timer("download.decode"):
+                return Response(cbor.loads(payload))
+        if config.cache_only:
+            # Re-parse mode never goes to the network.
+            return Response({
+                "error": f"{url} is not in the response cache.",
+                "status": CACHE_MISS_STATUS,
+                "url": url})
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    with _get_limit(config), metrics.timer("download.request"):
+        resp = _get_session(config).get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
     try:
         if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+            recorder = _get_recorder(config)
+            if recorder is not None:
+                recorder.record(url, resp.content)
+            with metrics.timer("download.decode"):
+                response = Response(cbor.loads(resp.content))
+            if cache is not None and response.status in CACHEABLE_STATUSES:
+                cache.put(url, resp.content, response.status)
+            return response
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
@@ -19,3 +100,10 @@ def download(url, config, logger=None):
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
         "url": url})
+
+
+def download_many(urls, config, logger=None):
+    # Fetch several urls with up to config.download_concurrency in flight.
+    # Returns Responses in the order of urls.
+    with ThreadPoolExecutor(max_workers=config.download_concurrency) as pool:
+        return list(pool.map(lambda url: download(url, config, logger), urls))
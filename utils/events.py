@@ -0,0 +1,56 @@
+import time
+import logging
+
+from threading import Lock
+
+
+class EventLog(object):
+    ''' Counts frequent, repetitive events by category instead of logging
+    each one.
+
+    Every event is counted. Its message is logged at DEBUG (dropped unless
+    the logger is set that low) and at most once per interval per category
+    at the given level, together with how many events of that category were
+    not logged since. Messages use logging's lazy %-style arguments, so a
+    suppressed event is never formatted. Thread safe. '''
+    def __init__(self, logger, interval=10.0):
+        self.logger = logger
+        self.interval = interval
+        self.lock = Lock()
+        self.counts = dict()
+        self.suppressed = dict()
+        self.last_logged = dict()
+
+    def record(self, category, message, *args, level=logging.INFO):
+        now = time.monotonic()
+        with self.lock:
+            self.counts[category] = self.counts.get(category, 0) + 1
+            if now - self.last_logged.get(category, -self.interval) < self.interval:
+                self.suppressed[category] = self.suppressed.get(category, 0) + 1
+                log = False
+            else:
+                self.last_logged[category] = now
+                suppressed = self.suppressed.pop(category, 0)
+                log = True
+        if log:
+            if suppressed:
+                message = f"{message} (+{suppressed} more {category} since last report)"
+            self.logger.log(level, message, *args)
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message, *args)
+
+    def summary(self):
+        with self.lock:
+            return dict(sorted(self.counts.items()))
+
+    def take_counts(self):
+        # The counts so far, reset; for a process that reports to another.
+        with self.lock:
+            counts, self.counts = self.counts, dict()
+        return counts
+
+    def add_counts(self, counts):
+        # Fold in another process's take_counts().
+        with self.lock:
+            for category, count in counts.items():
+                self.counts[category] = self.counts.get(category, 0) + count
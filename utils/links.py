@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+_MISSING = object()
+
+
+def canonical_url(base_url, href):
+    # Absolute url of href on the page at base_url, without its fragment and
+    # with scheme and host lowercased and a default port dropped. None if it
+    # is not an http(s) link (mailto:, javascript:, tel:, ...).
+    href = href.strip()
+    if not href or href[0] == "#":
+        return None
+    try:
+        scheme, netloc, path, query, _ = urlsplit(urljoin(base_url, href))
+    except ValueError:
+        # e.g. an unbalanced [ in the host
+        return None
+    scheme = scheme.lower()
+    if scheme not in DEFAULT_PORTS or not netloc:
+        return None
+    netloc = netloc.lower()
+    if netloc.endswith(DEFAULT_PORTS[scheme]):
+        netloc = netloc[:-len(DEFAULT_PORTS[scheme])]
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class LinkExtractor(object):
+    ''' The distinct, canonical links of a page that pass a static check.
+
+    extract() resolves every href against the page url (canonical_url),
+    keeps the first occurrence of each url on the page and runs check(url),
+    which returns a value for urls to keep and None for the rest. check
+    must not depend on crawl state: its results for the last capacity
+    distinct urls are kept in an LRU, so the links every page repeats
+    (navigation, footers) are checked once instead of on every page.
+    Thread safe. '''
+    def __init__(self, check, capacity=10000):
+        self.check = check
+        self.capacity = capacity
+        self.lock = Lock()
+        self.recent = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, base_url, hrefs):
+        # [(url, check(url))] of the kept links, in page order.
+        links = list()
+        on_page = set()
+        for href in dict.fromkeys(hrefs):
+            url = canonical_url(base_url, href)
+            if url is None or url in on_page:
+                continue
+            on_page.add(url)
+            with self.lock:
+                value = self.recent.get(url, _MISSING)
+                if value is not _MISSING:
+                    self.recent.move_to_end(url)
+                    self.hits += 1
+            if value is _MISSING:
+                value = self.check(url)
+                with self.lock:
+                    self.misses += 1
+                    if self.capacity:
+                        self.recent[url] = value
+                        if len(self.recent) > self.capacity:
+                            self.recent.popitem(last=False)
+            if value is not None:
+                links.append((url, value))
+        return links
+
+    def take_counts(self):
+        # (hits, misses) so far, reset; for a process that reports to another.
+        with self.lock:
+            counts = (self.hits, self.misses)
+            self.hits = self.misses = 0
+        return counts
+
+    def add_counts(self, counts):
+        # Fold in another process's take_counts().
+        with self.lock:
+            self.hits += counts[0]
+            self.misses += counts[1]
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+
+from bisect import bisect_left
+from threading import Lock, Thread, Event
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; memory is then read from /proc only.
+    resource = None
+
+# Latency bucket upper bounds: 1us doubling up to ~18 minutes.
+BUCKETS = [1e-6 * 2 ** i for i in range(31)]
+
+
+class Histogram(object):
+    ''' Fixed log2 buckets; observe() is a bisect and a few adds. '''
+    def __init__(self):
+        self.lock = Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bisect_left(BUCKETS, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation.
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "total": self.total,
+        }
+
+
+class _Timer(object):
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+def memory_rss():
+    # Current resident set size in bytes, or peak RSS where /proc is missing.
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return 0
+
+
+class Metrics(object):
+    ''' Process-wide registry of latency histograms, counters and gauges.
+
+    Cheap enough to leave on: timing a stage is two perf_counter calls and
+    one locked histogram update. snapshot() is only computed when the
+    reporter thread or the HTTP endpoint asks for it. '''
+    def __init__(self):
+        self.lock = Lock()
+        self.started = time.monotonic()
+        self.histograms = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self.stop_event = Event()
+        self.reporter = None
+        self.server = None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def timer(self, name):
+        # with metrics.timer("stage"): ...
+        return _Timer(self.histogram(name))
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read):
+        # read() is called whenever a snapshot is taken.
+        self.gauges[name] = read
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        gauges = dict()
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        gauges["memory.rss_bytes"] = memory_rss()
+        counters = dict(self.counters)
+        return {
+            "uptime": uptime,
+            "counters": counters,
+            "rates": {
+                f"{name}/sec": count / uptime if uptime else 0.0
+                for name, count in counters.items()},
+            "gauges": gauges,
+            "latency": {
+                name: histogram.summary()
+                for name, histogram in list(self.histograms.items())},
+        }
+
+    def dump(self, path):
+        # Write aside and rename so readers never see a partial file.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as out:
+            json.dump(self.snapshot(), out, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def start_reporter(self, path, interval):
+        def report():
+            while not self.stop_event.wait(interval):
+                self.dump(path)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.reporter = Thread(target=report, daemon=True)
+        self.reporter.start()
+
+    def serve(self, port, host="127.0.0.1"):
+        # GET / on host:port returns the current snapshot as JSON.
+        # http.server is imported here, most crawls never serve metrics.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self, path=None):
+        self.stop_event.set()
+        if path:
+            self.dump(path)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+metrics = Metrics()
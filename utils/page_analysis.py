@@ -0,0 +1,116 @@
+import re
+
+# Matches the "url=..." part of a meta refresh value, in any case.
+_REFRESH_URL = re.compile(r'\s*url\s*=(.*)', re.IGNORECASE | re.DOTALL)
+
+# The parser backend is imported on the first parse rather than with this
+# module, so processes that never parse a page (the coordinator, tools,
+# benchmarks) start without it. See load_backend().
+BACKEND = None
+
+
+class PageAnalysis(object):
+    ''' Everything the scraper needs from one page, built from a single parse. '''
+    def __init__(self, content, text, links, refresh_urls):
+        self.content_size = len(content)
+        self.text = text
+        self.tokens = text.split()
+        self.links = links
+        self.refresh_urls = refresh_urls
+        # text vs markup + text
+        self.text_ratio = (
+            len(text.strip()) / self.content_size
+            if self.content_size > 0 else 0)
+
+    @property
+    def is_dead(self):
+        return not self.tokens
+
+
+def _refresh_target(content):
+    # <meta http-equiv="refresh" content="0; url=..."> -- the target is the
+    # part after the ';', optionally quoted; a bare delay has no target.
+    if not content or ';' not in content:
+        return None
+    match = _REFRESH_URL.match(content.split(';', 1)[1])
+    if match is None:
+        return None
+    return match.group(1).strip().strip('\'"').strip() or None
+
+
+def _parse_selectolax(content):
+    tree = HTMLParser(content)
+    links = [node.attributes.get('href') for node in tree.css('a[href]')]
+    refresh = [
+        node.attributes.get('content')
+        for node in tree.css('meta[http-equiv="refresh"][content]')]
+    tree.strip_tags(['script', 'style', 'template'])
+    root = tree.root
+    text = root.text(separator=' ') if root is not None else ""
+    return text, [link for link in links if link is not None], refresh
+
+
+def _parse_lxml(content):
+    try:
+        if isinstance(content, str):
+            # lxml refuses str with an <?xml encoding=...?> declaration.
+            doc = lxml.html.document_fromstring(
+                content.encode("utf-8"),
+                parser=lxml.html.HTMLParser(encoding="utf-8"))
+        else:
+            doc = lxml.html.document_fromstring(content)
+    except (ParserError, ValueError):
+        return "", [], []
+    links = doc.xpath('//a/@href')
+    refresh = doc.xpath('//meta[@http-equiv="refresh"]/@content')
+    text = ' '.join(doc.xpath(
+        '//text()[not(ancestor::script) and not(ancestor::style)'
+        ' and not(ancestor::template)]'))
+    return text, [str(link) for link in links], [str(r) for r in refresh]
+
+
+def _parse_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    links = [a_tag['href'] for a_tag in soup.find_all('a', href=True)]
+    refresh = [
+        meta_tag['content'] for meta_tag in
+        soup.find_all('meta', {'http-equiv': 'refresh'}, content=True)]
+    return soup.get_text(separator=' '), links, refresh
+
+
+_PARSERS = {
+    "selectolax": _parse_selectolax,
+    "lxml": _parse_lxml,
+    "html.parser": _parse_bs4,
+}
+
+
+def load_backend():
+    # Import the fastest available parser backend; returns its name.
+    global BACKEND, HTMLParser, lxml, ParserError, BeautifulSoup
+    if BACKEND is not None:
+        return BACKEND
+    try:
+        # selectolax 1.0 dropped the Modest backend in selectolax.parser.
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        BACKEND = "selectolax"
+    except ImportError:
+        try:
+            import lxml.html
+            from lxml.etree import ParserError
+            BACKEND = "lxml"
+        except ImportError:
+            from bs4 import BeautifulSoup
+            BACKEND = "html.parser"
+    return BACKEND
+
+
+def analyze_page(content):
+    # Parse the page exactly once with the fastest available backend. content
+    # is the decoded text (RawResponse.text) or the raw bytes.
+    if not content:
+        return PageAnalysis("", "", [], [])
+    text, links, refresh = _PARSERS[load_backend()](content)
+    refresh_urls = [
+        target for target in map(_refresh_target, refresh) if target]
+    return PageAnalysis(content, text, links, refresh_urls)
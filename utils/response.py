@@ -1,14 +1,171 @@
+import io
+import re
 import pickle
 
+# A <meta charset=...> or <meta http-equiv="Content-Type" content="...;
+# charset=..."> near the start of the body.
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([a-zA-Z0-9_.:-]+)""", re.I)
+CHARSET_SNIFF_BYTES = 1024
+
+# Modules of the classes in a pickled requests.Response that the crawler never
+# reads: the cookie jar and its policy, and the PreparedRequest.
+_DISCARDED_MODULES = ("requests.models", "requests.cookies", "http.cookiejar")
+
+
+class _Discarded(object):
+    # Stands in for any of those; takes whatever it is rebuilt with.
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+
+class Headers(object):
+    ''' Case-insensitive, read-only response headers. Unpickled in place of
+    requests' CaseInsensitiveDict, whose state is the same store of
+    lowercase name -> (name, value). '''
+    __slots__ = ("_store",)
+
+    def __init__(self, headers=None):
+        self._store = {
+            name.lower(): (name, value) for name, value in (headers or {}).items()}
+
+    def __setstate__(self, state):
+        self._store = state["_store"]
+
+    def __getitem__(self, name):
+        return self._store[name.lower()][1]
+
+    def get(self, name, default=None):
+        entry = self._store.get(name.lower())
+        return entry[1] if entry is not None else default
+
+    def __contains__(self, name):
+        return name.lower() in self._store
+
+    def __iter__(self):
+        return (name for name, _ in self._store.values())
+
+    def __len__(self):
+        return len(self._store)
+
+    def items(self):
+        return list(self._store.values())
+
+
+class RawResponse(object):
+    ''' The parts of a requests.Response the crawler reads: status_code, url,
+    headers, encoding, reason and the body as content. Unpickled in place
+    of requests.Response, so the cookie jar, the PreparedRequest and their
+    objects are never built. text is decoded on first use, with the charset
+    from the Content-Type header or else a <meta> tag. '''
+    __slots__ = (
+        "content", "status_code", "headers", "url", "encoding", "reason",
+        "_charset", "_text")
+
+    def __init__(self, url=None, status_code=None, content=b"", headers=None,
+                 encoding=None, reason=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = Headers(headers)
+        self.encoding = encoding
+        self.reason = reason
+        self._charset = None
+        self._text = None
+
+    def __setstate__(self, state):
+        self.__init__(
+            state.get("url"), state.get("status_code"),
+            state.get("_content") or b"", None, state.get("encoding"),
+            state.get("reason"))
+        headers = state.get("headers")
+        if isinstance(headers, Headers):
+            self.headers = headers
+
+    @property
+    def charset(self):
+        if self._charset is None:
+            content_type = self.headers.get("Content-Type", "")
+            _, _, charset = content_type.lower().partition("charset=")
+            charset = charset.split(";")[0].strip(" \"'")
+            if not charset:
+                match = META_CHARSET.search(self.content[:CHARSET_SNIFF_BYTES])
+                charset = match.group(1).decode("ascii") if match else None
+            self._charset = charset or self.encoding or "utf-8"
+        return self._charset
+
+    @property
+    def text(self):
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.charset, "replace")
+            except LookupError:
+                self._text = self.content.decode("utf-8", "replace")
+        return self._text
+
+
+class _SlimUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module == "requests.models" and name == "Response":
+            return RawResponse
+        if module == "requests.structures" and name == "CaseInsensitiveDict":
+            return Headers
+        if module in _DISCARDED_MODULES:
+            return _Discarded
+        return super().find_class(module, name)
+
+
+def load_raw_response(raw_bytes):
+    # A RawResponse from a pickled requests.Response. Anything else pickled
+    # there is unpickled as it is.
+    try:
+        return _SlimUnpickler(io.BytesIO(raw_bytes)).load()
+    except Exception:
+        return pickle.loads(raw_bytes)
+
+
 class Response(object):
+    __slots__ = ("url", "status", "error", "raw_bytes", "_raw_response", "_raw_loaded")
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # The pickled requests.Response is only unpickled on first access of
+        # raw_response, so pages rejected from status, size or a byte prefix
+        # never pay for it.
+        self.raw_bytes = resp_dict["response"] if "response" in resp_dict else None
+        self._raw_response = None
+        self._raw_loaded = False
+
+    def __reduce__(self):
+        # Sent to parse processes still pickled, whether or not it was loaded.
+        resp_dict = {"url": self.url, "status": self.status, "error": self.error}
+        if self.raw_bytes is not None:
+            resp_dict["response"] = self.raw_bytes
+        return (Response, (resp_dict,))
+
+    @property
+    def raw_response(self):
+        if not self._raw_loaded:
+            try:
+                self._raw_response = (
+                    load_raw_response(self.raw_bytes)
+                    if self.raw_bytes is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+            self._raw_loaded = True
+        return self._raw_response
+
+    @property
+    def raw_size(self):
+        # Size of the pickled response, an upper bound on the body size.
+        return len(self.raw_bytes) if isinstance(self.raw_bytes, bytes) else 0
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import zlib
+import tempfile
+
+from collections import OrderedDict
+from threading import Lock
+
+from utils import get_urlhash
+
+# Status of the Response download() returns in cache-only mode for a url that
+# is not cached; outside the cache server's own error range (600-606).
+CACHE_MISS_STATUS = 608
+
+# Only these are stored: pages, and errors a retry would not change. A
+# transient server error cached with the default ttl would never be retried.
+CACHEABLE_STATUSES = frozenset({200, 404, 410})
+
+
+class ResponseCache(object):
+    ''' On-disk cache of cache server responses, keyed by url hash.
+
+    Each entry is the zlib-compressed payload download() received, stored
+    as <directory>/<hash[:2]>/<hash>, so it decodes to the same Response.
+    An append-only index log keeps the url, size, time stored and status
+    of every entry. The headers, ETag and Last-Modified included, are kept
+    in the payload but not used to revalidate: the cache server protocol
+    (GET /?q=<url>&u=<agent>) cannot pass a conditional request on to the
+    origin, so freshness is by age alone. Entries older than
+    ttl seconds (0 = never) are stale. Once the entries exceed max_bytes
+    the least recently used are deleted. Thread safe. '''
+    def __init__(self, directory, max_bytes=2 * 2 ** 30, ttl=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = Lock()
+        # urlhash -> [url, size, stored_at, status],
+        # least recently used first.
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.index_file = os.path.join(directory, "index.log")
+        self._load_index()
+        self.index = open(self.index_file, "a", encoding="utf-8")
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, encoding="utf-8") as index:
+            for line in index:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write.
+                    break
+                urlhash = record[1]
+                old = self.entries.pop(urlhash, None)
+                if old is not None:
+                    self.total_bytes -= old[1]
+                if record[0] == "put":
+                    self.entries[urlhash] = record[2:]
+                    self.total_bytes += record[3]
+        # Rewrite it without the records that were overwritten or deleted.
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as index:
+            for urlhash, entry in self.entries.items():
+                index.write(json.dumps(["put", urlhash, *entry]) + "\n")
+        os.replace(tmp_file, self.index_file)
+
+    def _path(self, urlhash):
+        return os.path.join(self.directory, urlhash[:2], urlhash)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, url, allow_stale=False):
+        # The cached payload for url, or None if missing or stale.
+        urlhash = get_urlhash(url)
+        with self.lock:
+            entry = self.entries.get(urlhash)
+            if entry is None or (
+                    self.ttl and not allow_stale
+                    and time.time() - entry[2] > self.ttl):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(urlhash)
+            self.hits += 1
+        try:
+            with open(self._path(urlhash), "rb") as cached:
+                return zlib.decompress(cached.read())
+        except (OSError, zlib.error):
+            return None
+
+    def put(self, url, payload, status):
+        urlhash = get_urlhash(url)
+        data = zlib.compress(payload)
+        path = self._path(urlhash)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer, so two threads storing the same url don't
+        # write into one temporary file.
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as cached:
+            cached.write(data)
+        os.replace(tmp_path, path)
+        entry = [url, len(data), time.time(), status]
+        with self.lock:
+            old = self.entries.pop(urlhash, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[urlhash] = entry
+            self.total_bytes += len(data)
+            self.index.write(json.dumps(["put", urlhash, *entry]) + "\n")
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                self._evict()
+            self.index.flush()
+
+    def _evict(self):
+        urlhash, entry = self.entries.popitem(last=False)
+        self.total_bytes -= entry[1]
+        self.index.write(json.dumps(["del", urlhash]) + "\n")
+        try:
+            os.remove(self._path(urlhash))
+        except OSError:
+            pass
+
+    def summary(self):
+        return (f"{len(self.entries)} entries, {self.total_bytes} bytes, "
+                f"{self.hits} hits, {self.misses} misses")
+
+    def close(self):
+        with self.lock:
+            self.index.close()
@@ -0,0 +1,190 @@
+import math
+import heapq
+
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from threading import Lock
+
+
+def digest(key):
+    # 64-bit fingerprint of a key; 0 is reserved for empty hash table slots.
+    value = int.from_bytes(
+        blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+    return value or 1
+
+
+class BloomFilter(object):
+    ''' Fixed-size Bloom filter over 64-bit digests. A negative answer lets a
+        seen-set skip its own lookup; positives are always confirmed. '''
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(64, int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing on the two halves of the digest.
+        h1, h2 = value & 0xFFFFFFFF, (value >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(value))
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class SeenSet(ABC):
+    ''' Set of string keys stored only as 64-bit digests.
+
+    add() returns True when the key was not seen before. Mutations take a
+    lock; lookups do not, and never observe a half-updated structure. '''
+    def __init__(self, bloom_capacity=0):
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+        self.count = 0
+        self.lock = Lock()
+
+    def add(self, key):
+        return self.add_digest(digest(key))
+
+    def add_digest(self, value):
+        with self.lock:
+            if self._contains_digest(value):
+                return False
+            self._add_digest(value)
+            if self.bloom is not None:
+                self.bloom.add(value)
+            self.count += 1
+            return True
+
+    def __contains__(self, key):
+        value = digest(key)
+        if self.bloom is not None and value not in self.bloom:
+            return False
+        return self._contains_digest(value)
+
+    def __len__(self):
+        return self.count
+
+    def memory_bytes(self):
+        return self.bloom.memory_bytes() if self.bloom is not None else 0
+
+    @abstractmethod
+    def digests(self):
+        # Every stored digest, e.g. to checkpoint the set.
+        pass
+
+    @abstractmethod
+    def _add_digest(self, value):
+        # Store a digest not yet in the set; called with the lock held.
+        pass
+
+    @abstractmethod
+    def _contains_digest(self, value):
+        pass
+
+
+class HashSeenSet(SeenSet):
+    ''' Open-addressing table of digests with linear probing. '''
+    MAX_LOAD = 0.7
+
+    def __init__(self, capacity=1 << 16, bloom_capacity=0):
+        super().__init__(bloom_capacity)
+        capacity = 1 << max(4, (capacity - 1).bit_length())
+        self.table = array("Q", bytes(8 * capacity))
+
+    def _slot(self, table, value):
+        mask = len(table) - 1
+        index = value & mask
+        while True:
+            slot = table[index]
+            if slot == value or slot == 0:
+                return index
+            index = (index + 1) & mask
+
+    def digests(self):
+        return (value for value in self.table if value)
+
+    def _contains_digest(self, value):
+        table = self.table
+        return table[self._slot(table, value)] == value
+
+    def _add_digest(self, value):
+        if self.count + 1 > len(self.table) * self.MAX_LOAD:
+            self._grow()
+        self.table[self._slot(self.table, value)] = value
+
+    def _grow(self):
+        # Build the new table aside so concurrent lookups see old or new.
+        table = array("Q", bytes(16 * len(self.table)))
+        for value in self.table:
+            if value:
+                table[self._slot(table, value)] = value
+        self.table = table
+
+    def memory_bytes(self):
+        return (super().memory_bytes()
+                + self.table.itemsize * len(self.table))
+
+
+class SortedSeenSet(SeenSet):
+    ''' Sorted array of digests, searched with bisect. New digests collect in
+        a small buffer that is merged in once it reaches merge_ratio of the
+        array, so inserts stay amortised O(log n). '''
+    MIN_BUFFER = 4096
+
+    def __init__(self, merge_ratio=0.125, bloom_capacity=0):
+        super().__init__(bloom_capacity)
+        self.merge_ratio = merge_ratio
+        self.sorted_digests = array("Q")
+        self.buffer = set()
+
+    def digests(self):
+        # A merge replaces both under the lock; take them together.
+        with self.lock:
+            sorted_digests, buffered = self.sorted_digests, sorted(self.buffer)
+        return heapq.merge(sorted_digests, buffered)
+
+    def _contains_digest(self, value):
+        # Buffer first: a merge publishes the new array before clearing it.
+        if value in self.buffer:
+            return True
+        digests = self.sorted_digests
+        index = bisect_left(digests, value)
+        return index < len(digests) and digests[index] == value
+
+    def _add_digest(self, value):
+        self.buffer.add(value)
+        if len(self.buffer) >= max(
+                self.MIN_BUFFER, len(self.sorted_digests) * self.merge_ratio):
+            self.sorted_digests = array(
+                "Q", heapq.merge(self.sorted_digests, sorted(self.buffer)))
+            self.buffer = set()
+
+    def memory_bytes(self):
+        # A buffered int costs roughly a 32-byte int plus a 16-byte set slot.
+        return (super().memory_bytes()
+                + self.sorted_digests.itemsize * len(self.sorted_digests)
+                + 48 * len(self.buffer))
+
+
+SEEN_SETS = {
+    "hash": HashSeenSet,
+    "sorted": SortedSeenSet,
+}
+
+
+def make_seen_set(kind="hash", bloom_capacity=0):
+    try:
+        return SEEN_SETS[kind](bloom_capacity=bloom_capacity)
+    except KeyError:
+        raise ValueError(
+            f"Unknown seen-set {kind!r}, expected one of {sorted(SEEN_SETS)}")
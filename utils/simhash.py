@@ -0,0 +1,121 @@
+from collections import deque
+from hashlib import blake2b
+from threading import Lock
+
+BITS = 64
+# SimHash keeps one counter per fingerprint bit. Each counter lives in its
+# own 32-bit lane of one big int, so a token's weight is added to all 64
+# counters with a single multiply-add instead of a 64-step loop.
+LANE = 32
+LANE_MASK = (1 << LANE) - 1
+_SPREAD = [
+    sum(((byte >> bit) & 1) << (LANE * bit) for bit in range(8))
+    for byte in range(256)]
+# Fewer distinct words than this don't make a meaningful SimHash: with none
+# every page would get fingerprint 0, and with a few they collide easily.
+MIN_FEATURES = 8
+
+
+def _hash(token):
+    # Stable across processes, unlike hash().
+    return blake2b(token.encode("utf-8"), digest_size=8).digest()
+
+
+def checksum(tokens):
+    # Exact-duplicate fingerprint of the page text, whitespace-normalized.
+    return int.from_bytes(_hash(" ".join(tokens)), "big")
+
+
+def simhash(word_counts):
+    # 64-bit SimHash of a word -> weight mapping, or None if it has fewer
+    # than MIN_FEATURES words; such pages are only checked for exact copies.
+    if len(word_counts) < MIN_FEATURES:
+        return None
+    total = 0
+    lanes = 0
+    for word, weight in word_counts.items():
+        spread = 0
+        for index, byte in enumerate(_hash(word)):
+            spread |= _SPREAD[byte] << (LANE * 8 * index)
+        lanes += weight * spread
+        total += weight
+    fingerprint = 0
+    for bit in range(BITS):
+        if 2 * ((lanes >> (LANE * bit)) & LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex(object):
+    ''' Bounded index of page fingerprints.
+
+    Exact duplicates are found by checksum. Near duplicates (SimHash within
+    max_distance bits, for pages that have a fingerprint) are found through max_distance + 1 band tables: two
+    fingerprints that close must agree exactly on at least one band, so only
+    pages sharing a band are compared. Once capacity pages are indexed the
+    oldest is evicted. Thread safe. '''
+    EXACT = "exact"
+    NEAR = "near"
+
+    def __init__(self, capacity=100000, max_distance=3):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self.band_bits = BITS // bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.tables = [dict() for _ in range(bands)]
+        self.checksums = set()
+        self.order = deque()
+        self.lock = Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+
+    def _bands(self, fingerprint):
+        return [
+            (fingerprint >> (self.band_bits * band)) & self.band_mask
+            for band in range(len(self.tables))]
+
+    def check_and_add(self, page_checksum, fingerprint):
+        # EXACT or NEAR if an indexed page matches, else index it and return None.
+        with self.lock:
+            self.lookups += 1
+            if page_checksum in self.checksums:
+                self.exact_hits += 1
+                return self.EXACT
+            bands = self._bands(fingerprint) if fingerprint is not None else []
+            for table, band in zip(self.tables, bands):
+                for other in table.get(band, ()):
+                    if hamming_distance(fingerprint, other) <= self.max_distance:
+                        self.near_hits += 1
+                        return self.NEAR
+            self.checksums.add(page_checksum)
+            for table, band in zip(self.tables, bands):
+                table.setdefault(band, []).append(fingerprint)
+            self.order.append((page_checksum, fingerprint))
+            if len(self.order) > self.capacity:
+                self._evict()
+            return None
+
+    def _evict(self):
+        old_checksum, old_fingerprint = self.order.popleft()
+        self.checksums.discard(old_checksum)
+        if old_fingerprint is None:
+            return
+        for table, band in zip(self.tables, self._bands(old_fingerprint)):
+            entries = table[band]
+            entries.remove(old_fingerprint)
+            if not entries:
+                del table[band]
+
+    def __len__(self):
+        return len(self.order)
+
+    def hit_rate(self):
+        if not self.lookups:
+            return 0.0
+        return (self.exact_hits + self.near_hits) / self.lookups
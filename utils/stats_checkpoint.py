@@ -0,0 +1,127 @@
+import os
+import time
+import pickle
+
+from array import array
+from collections import Counter
+
+
+class StatsCheckpoint(object):
+    ''' Incremental on-disk checkpoint of the crawl analytics.
+
+    Merged pages are collected into a delta (new seen-url digests, word
+    counts, subdomain counts, longest page) that is appended to
+    <path>.log every batch_pages pages or flush_interval seconds. Every
+    compact_every deltas the full state from state_fn() is written to
+    <path> and the log is truncated. load() returns the snapshot with all
+    logged deltas applied. Snapshots and deltas carry a generation so a
+    crash between writing a snapshot and dropping the log can't apply the
+    same delta twice. '''
+    def __init__(self, path, state_fn, batch_pages=50, flush_interval=30.0,
+                 compact_every=20):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.state_fn = state_fn
+        self.batch_pages = batch_pages
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.deltas_logged = 0
+        self.generation = 0
+        self.last_flush = time.monotonic()
+        self._reset_delta()
+        self.log = None
+
+    def _reset_delta(self):
+        self.pages = 0
+        self.seen = array("Q")
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.longest = ("", 0)
+
+    def remove(self):
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load(self):
+        # None when nothing was checkpointed yet.
+        state = None
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as snapshot:
+                state = pickle.load(snapshot)
+            state["subdomains"] = Counter(state["subdomains"])
+            self.generation = state.get("generation", 0)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as log:
+                while True:
+                    try:
+                        delta = pickle.load(log)
+                    except (EOFError, pickle.UnpicklingError, ValueError):
+                        # End of log, or a record torn by a crash.
+                        break
+                    if delta["generation"] == self.generation:
+                        state = self._apply(state, delta)
+        return state
+
+    def _apply(self, state, delta):
+        if state is None:
+            state = {"seen": array("Q"), "words": None,
+                     "word_deltas": [], "subdomains": Counter(),
+                     "longest": ("", 0)}
+        state["seen"].extend(delta["seen"])
+        state.setdefault("word_deltas", []).append(delta["words"])
+        state["subdomains"].update(delta["subdomains"])
+        if delta["longest"][1] > state["longest"][1]:
+            state["longest"] = delta["longest"]
+        return state
+
+    def record(self, seen_digest, word_counts, subdomain, page_pair):
+        # Called once per merged page, under the caller's stats lock.
+        self.pages += 1
+        self.seen.append(seen_digest)
+        self.words.update(word_counts)
+        self.subdomains[subdomain] += 1
+        if page_pair[1] > self.longest[1]:
+            self.longest = page_pair
+        if (self.pages >= self.batch_pages
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.pages:
+            if self.log is None:
+                self.log = open(self.log_path, "ab")
+            pickle.dump({
+                "seen": self.seen, "words": dict(self.words),
+                "subdomains": dict(self.subdomains), "longest": self.longest,
+                "generation": self.generation,
+            }, self.log, protocol=pickle.HIGHEST_PROTOCOL)
+            self.log.flush()
+            self._reset_delta()
+            self.deltas_logged += 1
+        self.last_flush = time.monotonic()
+        if self.deltas_logged >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Write the snapshot aside and swap it in, then drop the log. The
+        # snapshot already covers the unflushed delta, so that goes too.
+        self._reset_delta()
+        state = self.state_fn()
+        state["generation"] = self.generation + 1
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as snapshot:
+            pickle.dump(state, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, self.path)
+        self.generation += 1
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.deltas_logged = 0
+
+    def close(self):
+        self.compact()
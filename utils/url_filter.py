@@ -0,0 +1,97 @@
+import re
+from urllib.parse import parse_qs, urlencode, urlunparse
+
+VALID_DOMAINS = (".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu", ".stat.uci.edu")
+VALID_PATH = "today.uci.edu/department/information_computer_sciences"
+
+# Query parameters that don't change page content (tracking, sessions, views).
+EXCLUDED_PARAMS = frozenset([
+    'sessionId', 'PHPSESSID', 'JSESSIONID', 'utm_source', 'utm_medium',
+    'utm_campaign', 'utm_term', 'utm_content', 'gclid', 'fbclid', 'ref',
+    'tracking_id', 'referrer', 'source', 'entry', 'index', 'view', 'sort',
+    'filter', 'format', 't', 'token', 'lang', 'locale', 'calendar',
+    'eventDate', 'eventDisplay', 'post_type', 'outlook-ical', 'ical',
+    'comment',
+])
+
+CALENDAR_PATTERNS = [
+    r"(?:/day/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # /day/yyyy-mm-dd or /day/mm-dd-yyyy
+    r"(?:/month/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))",  # /month/yyyy-mm or /month/mm-yyyy
+    r"(?:/events/(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # /events/yyyy-mm-dd or /events/mm-dd-yyyy
+    r"(?:=(?:(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})))",  # =yyyy-mm-dd or =mm-dd-yyyy (date passed as query param)
+    r"(?:/(?:(\d{4}-\d{2})|(\d{2}-\d{4})))",  # /yyyy-mm or /mm-yyyy
+    r"(?<=\?|&)ical=[^&]*",  # ical=...
+    r"(?<=\?|&)outlook-ical=[^&]*",  # outlook-ical=...
+]
+
+# Suffixes, not dotted extensions: the original check matched r".*(ext)$",
+# so a path like /maps is rejected for ending in "ps". Kept as-is so the
+# filter makes exactly the same decisions.
+EXCLUDED_SUFFIXES = tuple("""
+    css js bmp gif jpg jpeg ico png tif tiff mid mp2 mp3 mp4 wav avi mov mpeg
+    ram m4v mkv ogg ogv pdf ps eps tex ppt pptx doc docx xls xlsx names data
+    dat exe bz2 tar msi bin 7z psd dmg iso epub dll cnf tgz sha1 thmx mso arff
+    rtf jar csv rm smil wmv swf wma zip rar gz""".split())
+
+# Reasons returned by UrlFilter.reject_reason.
+SCHEME, DOMAIN, HEURISTIC, CALENDAR, EXTENSION = (
+    "scheme", "domain", "heuristic", "calendar", "extension")
+
+
+class UrlFilter(object):
+    ''' The static part of scraper.is_valid, built once.
+
+    Patterns are compiled up front, the domain check is a set lookup per
+    dot-suffix of the host, and the extension check is one str.endswith
+    over a tuple. '''
+    def __init__(self, domains=VALID_DOMAINS, valid_path=VALID_PATH):
+        self.domains = frozenset(domains)
+        self.valid_path = valid_path
+        self.schemes = frozenset(["http", "https"])
+        self.calendar = re.compile("|".join(CALENDAR_PATTERNS))
+        self.heuristic_path = re.compile(r"/(?:uploads|files)(?:/|$)")
+
+    def domain_allowed(self, netloc):
+        index = netloc.find(".")
+        while index != -1:
+            if netloc[index:] in self.domains:
+                return True
+            index = netloc.find(".", index + 1)
+        return False
+
+    def is_calendar_page(self, parsed):
+        search = self.calendar.search
+        return bool(search(parsed.path) or search(parsed.query))
+
+    def reject_reason(self, parsed):
+        # None if the url may be crawled, otherwise why it may not.
+        if parsed.scheme not in self.schemes:
+            return SCHEME
+        if not (self.domain_allowed(parsed.netloc)
+                or self.valid_path in parsed.netloc + parsed.path):
+            return DOMAIN
+
+        # common signs of invalid/low info gain content
+        path = parsed.path.lower()
+        query = parsed.query.lower()
+        if (self.heuristic_path.search(path)
+                or "login" in path
+                or "action=download" in query
+                or "action=login" in query
+                or "share=" in query):
+            return HEURISTIC
+
+        if self.is_calendar_page(parsed):
+            return CALENDAR
+
+        if path.endswith(EXCLUDED_SUFFIXES):
+            return EXTENSION
+        return None
+
+    def normalize(self, parsed_url):
+        # Drop excluded query parameters and rebuild the url.
+        query_params = {
+            key: value for key, value in parse_qs(parsed_url.query).items()
+            if key not in EXCLUDED_PARAMS}
+        normalized_query = urlencode(query_params, doseq=True)
+        return urlunparse(parsed_url._replace(query=normalized_query))
@@ -0,0 +1,158 @@
+import re
+import heapq
+
+from collections import Counter
+from operator import itemgetter
+
+# A whitespace-delimited token containing two ASCII letters/digits in a row.
+# Matching whole \S runs gives the same tokens as text.split() followed by
+# the scraper's old per-word re.search(r"[a-zA-Z0-9]{2,}", word) filter.
+# Both are meant for the original case: lowercasing first would let in words
+# like "\u212ab" (Kelvin sign), which only becomes ASCII "kb" once lowercased.
+TOKEN_PATTERN = re.compile(r"\S*[a-zA-Z0-9]{2,}\S*")
+# The same test on a single whitespace-delimited word.
+WORD_PATTERN = re.compile(r"[a-zA-Z0-9]{2,}")
+# The only characters whose lowercase has an ASCII letter or digit (Kelvin
+# sign, capital I with dot). Text without them can be lowercased before the
+# test with the same result, which is much cheaper.
+LOWERS_TO_ASCII = ("\u212a", "\u0130")
+
+
+def _lowers_to_ascii(text):
+    return any(char in text for char in LOWERS_TO_ASCII)
+
+
+def tokenize(text, stop_words):
+    # Lowercased word tokens of text without stop words, in one regex pass.
+    if _lowers_to_ascii(text):
+        words = (word.lower() for word in TOKEN_PATTERN.findall(text))
+        return [word for word in words if word not in stop_words]
+    return [word for word in TOKEN_PATTERN.findall(text.lower())
+            if word not in stop_words]
+
+
+def _exact_counts(text, stop_words):
+    # Tests each word in its original case; for text _lowers_to_ascii.
+    word_counts = Counter()
+    for word in text.split():
+        if WORD_PATTERN.search(word):
+            word = word.lower()
+            if word not in stop_words:
+                word_counts[word] += 1
+    return word_counts
+
+
+def _drop_rejected(word_counts, rejected):
+    # Deleting keeps the first-seen order of the remaining words.
+    for word in rejected:
+        del word_counts[word]
+    return word_counts
+
+
+def count_words(text, stop_words):
+    # Same Counter, in the same order, as Counter(tokenize(text, stop_words)).
+    # Splitting on whitespace is much cheaper than the token regex, which
+    # then only runs once per distinct word instead of once per token.
+    if _lowers_to_ascii(text):
+        return _exact_counts(text, stop_words)
+    word_counts = Counter(
+        [word for word in text.lower().split() if word not in stop_words])
+    return _drop_rejected(word_counts, [
+        word for word in word_counts if not WORD_PATTERN.search(word)])
+
+
+def count_words_batch(texts, stop_words):
+    # count_words of each text. The regex test runs once per distinct word
+    # of the whole batch, against their shared vocabulary. The crawler gets
+    # its pages one at a time and uses count_words; this is for counting
+    # many stored pages at once, e.g. benchmarks.word_counts --corpus.
+    counts = [
+        _exact_counts(text, stop_words) if _lowers_to_ascii(text) else
+        Counter([word for word in text.lower().split() if word not in stop_words])
+        for text in texts]
+    vocabulary = set().union(*counts)
+    rejected = {word for word in vocabulary if not WORD_PATTERN.search(word)}
+    if rejected:
+        for word_counts in counts:
+            _drop_rejected(word_counts, rejected.intersection(word_counts))
+    return counts
+
+
+class WordStats(object):
+    ''' Word frequencies for the whole crawl.
+
+    With top_k = 0 every word is counted exactly. With top_k > 0 only the
+    top_k most frequent words are tracked (Space-Saving): memory stays
+    bounded and each reported count overestimates the true count by at most
+    errors[word]. snapshot() and merge() let workers or processes combine
+    their counts. Not thread safe; callers hold their own lock. '''
+    def __init__(self, top_k=0):
+        self.top_k = top_k
+        self.counts = Counter()
+        self.errors = dict()
+        # Approximate mode: one (count, word) entry per tracked word. Counts
+        # only grow, so a stale entry is refreshed when it reaches the top.
+        self.heap = list()
+        self.total = 0
+
+    def update(self, word_counts):
+        # Add a mapping of word -> count, e.g. one page's Counter.
+        self.total += sum(word_counts.values())
+        if not self.top_k:
+            self.counts.update(word_counts)
+            return
+        for word, count in word_counts.items():
+            self._add(word, count, 0)
+
+    def _add(self, word, count, error):
+        if word in self.counts:
+            self.counts[word] += count
+            if error:
+                self.errors[word] = self.errors.get(word, 0) + error
+            return
+        if len(self.counts) >= self.top_k:
+            # Replace the least frequent word; its count bounds the error.
+            floor = self._evict_min()
+            count += floor
+            error += floor
+        self.counts[word] = count
+        if error:
+            self.errors[word] = error
+        heapq.heappush(self.heap, (count, word))
+
+    def _evict_min(self):
+        while True:
+            count, word = heapq.heappop(self.heap)
+            current = self.counts[word]
+            if current != count:
+                heapq.heappush(self.heap, (current, word))
+                continue
+            del self.counts[word]
+            self.errors.pop(word, None)
+            return count
+
+    def most_common(self, n):
+        if not self.top_k:
+            return self.counts.most_common(n)
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def snapshot(self):
+        return {
+            "top_k": self.top_k,
+            "counts": dict(self.counts),
+            "errors": dict(self.errors),
+            "total": self.total,
+        }
+
+    def merge(self, snapshot):
+        # Fold in another WordStats' snapshot.
+        errors = snapshot.get("errors", {})
+        self.total += snapshot["total"]
+        if not self.top_k:
+            self.counts.update(snapshot["counts"])
+            return
+        for word, count in snapshot["counts"].items():
+            self._add(word, count, errors.get(word, 0))